@@ -7,15 +7,111 @@ mostrando el gradiente de preferencia entre puertos y datos de empresas.
 """
 
 import os
+import gzip
 import json
 import uuid
-import math
+import shutil
+import functools
+import subprocess
+import jinja2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Optional, Any, Union
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.default import MAPBOX_CONFIG, COLORES
 
+# Encoders JSON reutilizables a nivel de módulo. ensure_ascii=False evita
+# escapar acentos ("Timbúes", "Análisis"), reduciendo el tamaño de la salida
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+_PRETTY_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2).encode
+
+# orjson serializa varias veces más rápido que la librería estándar y maneja
+# arrays de NumPy de forma nativa; si no está instalado se usa el encoder
+# estándar como respaldo
+try:
+    import orjson
+
+    def _fast_encode(obj: Any) -> str:
+        return orjson.dumps(
+            obj,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        ).decode()
+except ImportError:
+    orjson = None
+    _fast_encode = _ENCODER
+
+# Activos estáticos compartidos (JS/CSS de la visualización). Se leen una
+# sola vez al importar: inline para uso vía file://, o referenciados por
+# URL cacheable cuando el HTML se sirve desde el servidor Flask
+_STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+with open(os.path.join(_STATIC_DIR, "viz.css"), encoding="utf-8") as _f:
+    _VIZ_CSS = _f.read()
+with open(os.path.join(_STATIC_DIR, "viz.js"), encoding="utf-8") as _f:
+    _VIZ_JS = _f.read()
+
+# Template HTML compilado una sola vez a nivel de módulo: Jinja lo convierte
+# a bytecode en el import y cada render es una escritura lineal, en lugar de
+# re-interpolar todo el texto estático de JS/CSS en cada solicitud
+_VIZ_TEMPLATE = jinja2.Environment(autoescape=False).from_string("""\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>{{ title }}</title>
+    <meta name="viewport" content="initial-scale=1,maximum-scale=1,user-scalable=no">
+    <link href="https://api.mapbox.com/mapbox-gl-js/v2.12.0/mapbox-gl.css" rel="stylesheet">
+    <script src="https://api.mapbox.com/mapbox-gl-js/v2.12.0/mapbox-gl.js"></script>
+{% if inline_assets %}
+    <style>
+{{ viz_css }}
+    </style>
+{% else %}
+    <link rel="stylesheet" href="/static/viz.css">
+{% endif %}
+</head>
+<body>
+    <div id="map"></div>
+
+    <div class="map-overlay" id="legend">
+        <div class="legend-title">{{ legend.title }}</div>
+
+        <div class="gradient-bar" style="background: linear-gradient(to right, {{ legend.min_color }}, {{ legend.neutral_color }}, {{ legend.max_color }})"></div>
+        <div class="gradient-labels">
+            <span>{{ legend.min_label }} ({{ legend_min_value }})</span>
+            <span>{{ legend.neutral_label }}</span>
+            <span>{{ legend.max_label }} ({{ legend_max_value }})</span>
+        </div>
+
+        <!-- Elementos de leyenda adicionales se agregarán aquí con JavaScript -->
+        <div id="legend-items"></div>
+
+        <!-- Panel de sensibilidad (si existe) -->
+        <div id="sensitivity-panel" class="sensitivity-panel" style="display: none;">
+            <div class="sensitivity-title">Análisis de Sensibilidad</div>
+            <div id="sensitivity-content"></div>
+        </div>
+    </div>
+
+    <div class="stats-panel" id="stats">
+        <div class="stats-title">Estadísticas</div>
+        <div id="stats-content"></div>
+    </div>
+
+    <script>window.__cfg = {{ mapbox_json }};</script>
+{% if inline_assets %}
+    <script>
+{{ viz_js }}
+    </script>
+{% else %}
+    <script src="/static/viz.js" defer></script>
+{% endif %}
+</body>
+</html>
+""")
+
 class MapboxVisualizationMCP:
     """
     Implementación MCP para visualización de resultados usando Mapbox.
@@ -26,7 +122,11 @@ class MapboxVisualizationMCP:
     - Mostrar líneas divisorias
     - Crear leyendas y paneles informativos
     """
-    
+
+    # Directorios ya creados en este proceso, para no repetir los syscalls
+    # de os.makedirs en cada instanciación
+    _dirs_ready: set = set()
+
     def __init__(self, config: Dict = None):
         """
         Inicializa el servicio MCP con la configuración de Mapbox.
@@ -42,9 +142,11 @@ class MapboxVisualizationMCP:
         self.colors = COLORES
         
         # Directorio para guardar los HTML generados (si se usa en modo local)
-        self.output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
+        self.output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
                                       "../data/exports/visualizations")
-        os.makedirs(self.output_dir, exist_ok=True)
+        if self.output_dir not in type(self)._dirs_ready:
+            os.makedirs(self.output_dir, exist_ok=True)
+            type(self)._dirs_ready.add(self.output_dir)
     
     def handle_request(self, action: str, context: Dict) -> Dict:
         """
@@ -110,12 +212,18 @@ class MapboxVisualizationMCP:
             
             # Preparar GeoJSON para los sectores
             features = []
-            
-            for sector in sectors:
-                # Asegurar que todas las propiedades necesarias existan
-                if "coordinates" not in sector or "differential" not in sector:
-                    continue
-                
+
+            # Filtrar sectores válidos y formatear todas las coordenadas en un
+            # solo paso vectorizado en lugar de una llamada por sector
+            valid_sectors = [
+                sector for sector in sectors
+                if "coordinates" in sector and "differential" in sector
+            ]
+            centers = self._format_coords_bulk(
+                [sector["coordinates"] for sector in valid_sectors]
+            )
+
+            for sector, center in zip(valid_sectors, centers):
                 # Normalizar diferencial para escala de colores (-1 a 1)
                 differential = sector["differential"]
                 normalized_diff = differential * normalize_factor
@@ -137,19 +245,14 @@ class MapboxVisualizationMCP:
                     },
                     "geometry": {
                         "type": "Polygon",
-                        "coordinates": self._create_sector_polygon(sector["coordinates"])
+                        "coordinates": self._create_sector_polygon(center)
                     }
                 }
                 
                 features.append(feature)
-            
-            # Crear estructura GeoJSON
-            geojson = {
-                "type": "FeatureCollection",
-                "features": features
-            }
-            
-            # Crear configuración para Mapbox
+
+            # Crear configuración para Mapbox con el FeatureCollection anidado
+            # directamente, sin estructuras intermedias
             mapbox_config = {
                 "container": "map",
                 "style": self.default_style,
@@ -158,7 +261,16 @@ class MapboxVisualizationMCP:
                 "accessToken": self.access_token,
                 "data": {
                     "type": "geojson",
-                    "data": geojson
+                    "generateId": True,
+                    # buffer 8 (vs. 128 por defecto) alcanza para polígonos
+                    # sin artefactos de borde; maxzoom 12 evita recortar
+                    # tiles a niveles de zoom que el análisis nunca usa
+                    "buffer": 8,
+                    "maxzoom": 12,
+                    "data": {
+                        "type": "FeatureCollection",
+                        "features": features
+                    }
                 },
                 "layers": [
                     {
@@ -167,7 +279,14 @@ class MapboxVisualizationMCP:
                         "source": "data",
                         "paint": {
                             "fill-color": ["get", "color"],
-                            "fill-opacity": 0.7
+                            # El hover se resalta vía feature-state, sin
+                            # reconstruir capas ni fuentes
+                            "fill-opacity": [
+                                "case",
+                                ["boolean", ["feature-state", "hover"], False],
+                                0.9,
+                                0.7
+                            ]
                         }
                     },
                     {
@@ -232,28 +351,54 @@ class MapboxVisualizationMCP:
             
             # Preparar GeoJSON para las empresas
             features = []
-            
-            for company in companies:
-                # Asegurar que todas las propiedades necesarias existan
-                if "coordenadas" not in company:
-                    continue
-                
+
+            # Filtrar empresas válidas y formatear todas las coordenadas en un
+            # solo paso vectorizado en lugar de una llamada por empresa
+            valid_companies = [
+                company for company in companies if "coordenadas" in company
+            ]
+            company_coords = self._format_coords_bulk(
+                [company["coordenadas"] for company in valid_companies]
+            )
+
+            # Calcular tamaños (5 a 15 px) y grosores de borde (1 a 5 px) para
+            # todas las empresas de una vez con NumPy
+            n_companies = len(valid_companies)
+            volumes = np.fromiter(
+                (c.get("volumenAnual", 0) for c in valid_companies),
+                dtype=np.float64, count=n_companies
+            )
+            savings = np.fromiter(
+                (c.get("ahorroAnual", 0) for c in valid_companies),
+                dtype=np.float64, count=n_companies
+            )
+            sizes = 5.0 + np.minimum(10.0, np.sqrt(volumes) / 100.0)
+            border_widths = 1.0 + np.minimum(4.0, np.log10(np.maximum(1.0, savings)) / 2.0)
+
+            timbues_count = 0
+            lima_count = 0
+            total_savings = 0
+
+            for i, (company, coords) in enumerate(zip(valid_companies, company_coords)):
                 # Determinar color y tamaño basado en volumen y puerto óptimo
                 puerto_optimo = company.get("puertoOptimo", "")
+                puerto_cf = puerto_optimo.casefold()
                 volume = company.get("volumenAnual", 0)
                 ahorro = company.get("ahorroAnual", 0)
-                
-                # Seleccionar color según puerto óptimo
-                if puerto_optimo.lower() == "timbúes" or puerto_optimo.lower() == "timbues":
+
+                # Seleccionar color según puerto óptimo (casefold una sola vez)
+                if puerto_cf in ("timbúes", "timbues"):
                     color = self.colors["EMPRESAS_TIMBUES"]
+                    timbues_count += 1
                 else:
                     color = self.colors["EMPRESAS_LIMA"]
-                
-                # Calcular tamaño según volumen (entre 5 y 15 px)
-                size = 5 + min(10, math.sqrt(volume) / 100)
-                
-                # Calcular grosor del borde según ahorro (entre 1 y 5 px)
-                border_width = 1 + min(4, math.log10(max(1, ahorro)) / 2)
+                    if puerto_cf == "lima":
+                        lima_count += 1
+
+                total_savings += ahorro
+
+                size = float(sizes[i])
+                border_width = float(border_widths[i])
                 
                 # Crear feature GeoJSON
                 feature = {
@@ -274,19 +419,14 @@ class MapboxVisualizationMCP:
                     },
                     "geometry": {
                         "type": "Point",
-                        "coordinates": self._format_coordinates(company["coordenadas"])
+                        "coordinates": coords
                     }
                 }
                 
                 features.append(feature)
-            
-            # Crear estructura GeoJSON
-            geojson = {
-                "type": "FeatureCollection",
-                "features": features
-            }
-            
-            # Crear configuración para Mapbox
+
+            # Crear configuración para Mapbox con el FeatureCollection anidado
+            # directamente, sin estructuras intermedias
             mapbox_config = {
                 "container": "map",
                 "style": self.default_style,
@@ -295,7 +435,16 @@ class MapboxVisualizationMCP:
                 "accessToken": self.access_token,
                 "data": {
                     "type": "geojson",
-                    "data": geojson
+                    # Para puntos no hace falta buffer; el clustering se
+                    # habilita por contexto cuando hay muchas empresas
+                    "buffer": 0,
+                    "maxzoom": 12,
+                    "cluster": context.get("cluster_points", False),
+                    "clusterRadius": 50,
+                    "data": {
+                        "type": "FeatureCollection",
+                        "features": features
+                    }
                 },
                 "layers": [
                     {
@@ -346,9 +495,9 @@ class MapboxVisualizationMCP:
                 "mapbox_config": mapbox_config,
                 "stats": {
                     "companies_count": len(features),
-                    "timbues_count": sum(1 for f in features if f["properties"]["port"].lower() in ["timbúes", "timbues"]),
-                    "lima_count": sum(1 for f in features if f["properties"]["port"].lower() == "lima"),
-                    "total_savings": sum(f["properties"]["savings"] for f in features)
+                    "timbues_count": timbues_count,
+                    "lima_count": lima_count,
+                    "total_savings": total_savings
                 }
             }
             
@@ -388,8 +537,12 @@ class MapboxVisualizationMCP:
                 "companies": context.get("companies", []),
             }
             
-            gradient_result = self.create_gradient_map(gradient_context)
-            company_result = self.create_company_map(company_context)
+            # Ambos mapas son independientes: generarlos en paralelo
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                gradient_future = executor.submit(self.create_gradient_map, gradient_context)
+                company_future = executor.submit(self.create_company_map, company_context)
+                gradient_result = gradient_future.result()
+                company_result = company_future.result()
             
             if "error" in gradient_result or "error" in company_result:
                 errors = []
@@ -418,11 +571,16 @@ class MapboxVisualizationMCP:
             ports = context.get("ports", [])
             if ports:
                 port_features = []
-                
-                for port in ports:
-                    if "name" not in port or "coordinates" not in port:
-                        continue
-                    
+
+                valid_ports = [
+                    port for port in ports
+                    if "name" in port and "coordinates" in port
+                ]
+                port_coords = self._format_coords_bulk(
+                    [port["coordinates"] for port in valid_ports]
+                )
+
+                for port, coords in zip(valid_ports, port_coords):
                     port_feature = {
                         "type": "Feature",
                         "properties": {
@@ -432,7 +590,7 @@ class MapboxVisualizationMCP:
                         },
                         "geometry": {
                             "type": "Point",
-                            "coordinates": self._format_coordinates(port["coordinates"])
+                            "coordinates": coords
                         }
                     }
                     
@@ -509,33 +667,110 @@ class MapboxVisualizationMCP:
                 - mapbox_config: configuración del mapa
                 - title (opcional): título de la visualización
                 - filename (opcional): nombre del archivo a generar
-                
+                - compress (opcional): si es True (por defecto), escribe además
+                  una copia comprimida con gzip (<filename>.gz) lista para
+                  servirse con Content-Encoding: gzip
+                - keep_uncompressed (opcional): si es True (por defecto),
+                  mantiene la copia sin comprimir para uso local vía file://
+                - inline_assets (opcional): si es True (por defecto), incrusta
+                  el JS/CSS en el HTML; con False los referencia en /static
+                  para que el navegador los cachee entre visualizaciones
+
         Returns:
             Ruta al archivo HTML generado
         """
         try:
             # Validar datos de entrada
             mapbox_config = context.get("mapbox_config")
-            
+
             if not mapbox_config:
                 return {"error": "Se requiere configuración de Mapbox"}
-            
+
             title = context.get("title", "Análisis Comparativo Timbúes vs. Lima (Zárate)")
             filename = context.get("filename", f"visualization_{uuid.uuid4()}.html")
-            
+            compress = context.get("compress", True)
+            keep_uncompressed = context.get("keep_uncompressed", True)
+            inline_assets = context.get("inline_assets", True)
+
+            # Reducir la precisión de las coordenadas y filtrar propiedades
+            # no usadas por el estilo antes de serializar
+            data_source = mapbox_config.get("data", {})
+            if isinstance(data_source.get("data"), dict):
+                self._quantize_coords(data_source["data"])
+                self._prune_properties(data_source["data"])
+
+            # Las reescrituras a /tiles y /visualizations son URLs relativas
+            # que solo resuelven detrás del servidor Flask: en el flujo local
+            # por defecto (URL file://) el fetch fallaría y el mapa quedaría
+            # vacío, así que solo aplican en modo servidor
+            # (inline_assets=False, cuando el HTML ya referencia /static)
+            if not inline_assets and isinstance(data_source.get("data"), dict):
+                data_blob = _fast_encode(data_source["data"])
+                viz_id = os.path.splitext(filename)[0]
+
+                # Por encima de ~5 MB de GeoJSON el cliente paga la conversión
+                # a tiles en cada carga; si tippecanoe está disponible,
+                # pre-generamos tiles vectoriales y servimos la capa como MVT
+                if len(data_blob) > self._TILE_THRESHOLD and \
+                        self._build_vector_tiles(data_source["data"], viz_id):
+                    # Copias superficiales: app.py embebe el mismo dict en su
+                    # respuesta JSON y no debe perder los datos inline
+                    mapbox_config = dict(mapbox_config)
+                    mapbox_config["data"] = {
+                        "type": "vector",
+                        "tiles": [f"/tiles/{viz_id}/{{z}}/{{x}}/{{y}}.pbf"],
+                        "minzoom": 0,
+                        "maxzoom": 14
+                    }
+                    mapbox_config["layers"] = [
+                        dict(layer, **{"source-layer": "sectors"})
+                        for layer in mapbox_config.get("layers", [])
+                    ]
+
+                # Entre 1 y 5 MB (o sin tippecanoe): se escribe el GeoJSON
+                # aparte y el HTML lo referencia por URL, de modo que el
+                # navegador lo descargue en paralelo con la carga del mapa
+                elif len(data_blob) > self._EXTERNAL_DATA_THRESHOLD:
+                    geojson_path = os.path.join(self.output_dir, f"{viz_id}.geojson")
+                    with open(geojson_path, "w", encoding="utf-8") as f:
+                        f.write(data_blob)
+                    mapbox_config = dict(mapbox_config)
+                    data_source = dict(data_source)
+                    del data_source["data"]
+                    data_source["dataUrl"] = f"/visualizations/{viz_id}.geojson"
+                    mapbox_config["data"] = data_source
+
             # Crear contenido HTML
-            html_content = self._generate_html_template(title, mapbox_config)
-            
-            # Guardar archivo
+            html_content = self._generate_html_template(
+                title, mapbox_config, inline_assets=inline_assets)
+            html_bytes = html_content.encode("utf-8")
+
+            # Guardar archivo (el HTML/GeoJSON es muy repetitivo y comprime
+            # ~10x con gzip, ahorrando disco y transferencia)
             file_path = os.path.join(self.output_dir, filename)
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(html_content)
-            
-            return {
+            compressed_path = None
+
+            if compress:
+                compressed_path = file_path + ".gz"
+                with gzip.open(compressed_path, "wb", compresslevel=6) as f:
+                    f.write(html_bytes)
+
+            if keep_uncompressed or not compress:
+                with open(file_path, "wb") as f:
+                    f.write(html_bytes)
+            else:
+                file_path = compressed_path
+
+            result = {
                 "status": "success",
                 "file_path": file_path,
                 "url": f"file://{file_path}"
             }
+
+            if compressed_path:
+                result["compressed_path"] = compressed_path
+
+            return result
             
         except Exception as e:
             return {
@@ -586,11 +821,6 @@ class MapboxVisualizationMCP:
         Returns:
             Lista de coordenadas que forman el polígono
         """
-        # Si center es [lat, lon], convertimos a [lon, lat]
-        center = self._format_coordinates(center)
-        if isinstance(center, str):
-            center = [float(x) for x in center.split(',')]
-        
         lon, lat = center
         half_size = size / 2
         
@@ -603,6 +833,138 @@ class MapboxVisualizationMCP:
             [lon - half_size, lat - half_size]
         ]]
     
+    def _format_coords_bulk(self, coordinates: List[List[float]]) -> List[List[float]]:
+        """
+        Formatea un lote de coordenadas para asegurar el orden [lon, lat].
+
+        Aplica el mismo criterio que `_format_coordinates` pero sobre todo el
+        lote a la vez con dos reducciones vectorizadas de NumPy, en lugar de
+        cuatro comparaciones Python por punto.
+
+        Args:
+            coordinates: Lista de pares de coordenadas
+
+        Returns:
+            Lista de coordenadas en formato [lon, lat]
+        """
+        if not coordinates:
+            return []
+
+        # Compatibilidad con el formato "lon,lat" en texto que aceptaba el
+        # camino por punto original: se parsea antes de la conversión en
+        # bloque (np.asarray fallaría con una entrada de tipo str)
+        coordinates = [
+            [float(x) for x in c.split(',')] if isinstance(c, str) else c
+            for c in coordinates
+        ]
+
+        arr = np.asarray(coordinates, dtype=np.float64)
+
+        # Si todo el lote cabe en rangos [lat, lon], invertimos los ejes
+        if np.abs(arr[:, 0]).max() <= 90 and np.abs(arr[:, 1]).max() <= 180:
+            arr = arr[:, ::-1]
+
+        return arr.tolist()
+
+    def _quantize_coords(self, geojson: Dict, decimals: int = 6) -> Dict:
+        """
+        Trunca la precisión de las coordenadas de un GeoJSON.
+
+        Seis decimales equivalen a ~11 cm en el terreno, más que suficiente
+        para la visualización; los float completos (15-17 decimales) pueden
+        duplicar o triplicar el tamaño del payload embebido sin beneficio
+        visual.
+
+        Args:
+            geojson: FeatureCollection (se modifica en el lugar)
+            decimals: Cantidad de decimales a conservar
+
+        Returns:
+            El mismo GeoJSON con coordenadas redondeadas
+        """
+        for feature in geojson.get("features", []):
+            geometry = feature.get("geometry", {})
+            coords = geometry.get("coordinates")
+            if coords:
+                # np.round opera sobre todo el anillo/punto en una pasada
+                geometry["coordinates"] = np.round(
+                    np.asarray(coords, dtype=np.float64), decimals
+                ).tolist()
+
+        return geojson
+
+    # Propiedades que el estilo de Mapbox y los popups realmente consumen;
+    # el resto (atributos analíticos intermedios) solo infla el payload
+    _STYLE_PROPS = frozenset({"id", "name", "color", "size", "border_width", "description"})
+
+    # Tamaño serializado (bytes) a partir del cual conviene pasar de una
+    # fuente GeoJSON inline a tiles vectoriales pre-generados
+    _TILE_THRESHOLD = 5_000_000
+
+    # Tamaño a partir del cual el GeoJSON se sirve como archivo aparte y el
+    # navegador lo descarga en paralelo con la inicialización del mapa
+    _EXTERNAL_DATA_THRESHOLD = 1_000_000
+
+    def _build_vector_tiles(self, geojson: Dict, viz_id: str) -> Optional[str]:
+        """
+        Pre-genera tiles vectoriales (MVT) para una capa GeoJSON grande.
+
+        Requiere tippecanoe instalado en el sistema; si no está disponible o
+        la conversión falla, devuelve None y la capa se sirve inline como
+        hasta ahora.
+
+        Args:
+            geojson: FeatureCollection a convertir
+            viz_id: Identificador de la visualización (nombre base del archivo)
+
+        Returns:
+            Ruta al archivo .mbtiles generado, o None si no se pudo generar
+        """
+        if not shutil.which("tippecanoe"):
+            return None
+
+        geojson_path = os.path.join(self.output_dir, f"{viz_id}.geojson")
+        mbtiles_path = os.path.join(self.output_dir, f"{viz_id}.mbtiles")
+
+        try:
+            with open(geojson_path, "w", encoding="utf-8") as f:
+                f.write(_fast_encode(geojson))
+
+            subprocess.run(
+                ["tippecanoe", "-zg", "-f", "-o", mbtiles_path,
+                 "--drop-densest-as-needed", "-l", "sectors", geojson_path],
+                check=True, capture_output=True
+            )
+            return mbtiles_path
+
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        finally:
+            if os.path.exists(geojson_path):
+                os.remove(geojson_path)
+
+    def _prune_properties(self, geojson: Dict) -> Dict:
+        """
+        Elimina de cada feature las propiedades que el mapa no utiliza.
+
+        Los features arrastran atributos del análisis (diferenciales,
+        volúmenes, regiones) que ninguna capa ni popup lee; quitarlos antes
+        de serializar reduce el HTML embebido y el heap del navegador.
+
+        Args:
+            geojson: FeatureCollection (se modifica en el lugar)
+
+        Returns:
+            El mismo GeoJSON con propiedades filtradas
+        """
+        allowed = self._STYLE_PROPS
+        for feature in geojson.get("features", []):
+            props = feature.get("properties")
+            if props:
+                feature["properties"] = {k: props[k] for k in allowed if k in props}
+
+        return geojson
+
     def _format_coordinates(self, coordinates: Union[List[float], Tuple[float, float]]) -> Union[List[float], str]:
         """
         Formatea coordenadas para asegurar que estén en orden [lon, lat].
@@ -629,271 +991,242 @@ class MapboxVisualizationMCP:
         # Si llegamos aquí, devolvemos tal cual
         return coordinates
     
-    def _generate_html_template(self, title: str, mapbox_config: Dict) -> str:
+    def _generate_html_template(self, title: str, mapbox_config: Dict, pretty: bool = False,
+                                inline_assets: bool = True) -> str:
         """
         Genera un template HTML con la visualización Mapbox.
-        
+
         Args:
             title: Título de la página
             mapbox_config: Configuración para Mapbox
-            
+            pretty: Si es True, emite el JSON con indentación (para depuración)
+            inline_assets: Si es True, incrusta el JS/CSS en el HTML (para uso
+                vía file://); si es False, los referencia en /static, donde el
+                navegador los cachea con max-age largo
+
         Returns:
             Contenido HTML completo
         """
-        # Convertir configuración a JSON
-        mapbox_json = json.dumps(mapbox_config, indent=2)
-        
-        # Template HTML básico
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>{title}</title>
-            <meta name="viewport" content="initial-scale=1,maximum-scale=1,user-scalable=no">
-            <link href="https://api.mapbox.com/mapbox-gl-js/v2.12.0/mapbox-gl.css" rel="stylesheet">
-            <script src="https://api.mapbox.com/mapbox-gl-js/v2.12.0/mapbox-gl.js"></script>
-            <style>
-                body {{ margin: 0; padding: 0; }}
-                #map {{ position: absolute; top: 0; bottom: 0; width: 100%; }}
-                
-                .map-overlay {{
-                    position: absolute;
-                    bottom: 15px;
-                    right: 15px;
-                    background: rgba(255, 255, 255, 0.9);
-                    border-radius: 5px;
-                    padding: 10px;
-                    box-shadow: 0 1px 5px rgba(0,0,0,0.2);
-                    font-family: Arial, sans-serif;
-                    max-width: 320px;
-                    overflow-y: auto;
-                    max-height: 80%;
-                }}
-                
-                .legend-title {{
-                    font-weight: bold;
-                    margin-bottom: 10px;
-                    font-size: 14px;
-                    text-align: center;
-                }}
-                
-                .gradient-bar {{
-                    height: 15px;
-                    width: 100%;
-                    background: linear-gradient(to right, {mapbox_config['legend']['min_color']}, {mapbox_config['legend']['neutral_color']}, {mapbox_config['legend']['max_color']});
-                    margin-bottom: 5px;
-                }}
-                
-                .gradient-labels {{
-                    display: flex;
-                    justify-content: space-between;
-                    font-size: 12px;
-                    margin-bottom: 15px;
-                }}
-                
-                .legend-item {{
-                    display: flex;
-                    align-items: center;
-                    margin-bottom: 5px;
-                    font-size: 12px;
-                }}
-                
-                .legend-color {{
-                    width: 15px;
-                    height: 15px;
-                    margin-right: 5px;
-                }}
-                
-                .sensitivity-panel {{
-                    margin-top: 15px;
-                    padding-top: 10px;
-                    border-top: 1px solid #ccc;
-                }}
-                
-                .sensitivity-title {{
-                    font-weight: bold;
-                    margin-bottom: 5px;
-                    font-size: 14px;
-                }}
-                
-                .stats-panel {{
-                    position: absolute;
-                    top: 15px;
-                    left: 15px;
-                    background: rgba(255, 255, 255, 0.9);
-                    border-radius: 5px;
-                    padding: 10px;
-                    box-shadow: 0 1px 5px rgba(0,0,0,0.2);
-                    font-family: Arial, sans-serif;
-                    max-width: 250px;
-                    font-size: 12px;
-                }}
-                
-                .stats-title {{
-                    font-weight: bold;
-                    margin-bottom: 5px;
-                    font-size: 14px;
-                }}
-                
-                .stats-item {{
-                    margin-bottom: 3px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div id="map"></div>
-            
-            <div class="map-overlay" id="legend">
-                <div class="legend-title">{mapbox_config['legend']['title']}</div>
-                
-                <div class="gradient-bar"></div>
-                <div class="gradient-labels">
-                    <span>{mapbox_config['legend']['min_label']} ({mapbox_config['legend']['min_value']:.2f})</span>
-                    <span>{mapbox_config['legend']['neutral_label']}</span>
-                    <span>{mapbox_config['legend']['max_label']} ({mapbox_config['legend']['max_value']:.2f})</span>
-                </div>
-                
-                <!-- Elementos de leyenda adicionales se agregarán aquí con JavaScript -->
-                <div id="legend-items"></div>
-                
-                <!-- Panel de sensibilidad (si existe) -->
-                <div id="sensitivity-panel" class="sensitivity-panel" style="display: none;">
-                    <div class="sensitivity-title">Análisis de Sensibilidad</div>
-                    <div id="sensitivity-content"></div>
-                </div>
-            </div>
-            
-            <div class="stats-panel" id="stats">
-                <div class="stats-title">Estadísticas</div>
-                <div id="stats-content"></div>
-            </div>
-            
-            <script>
-                // Configuración de Mapbox
-                const config = {mapbox_json};
-                
-                // Inicializar mapa
-                mapboxgl.accessToken = config.accessToken;
-                const map = new mapboxgl.Map({{
-                    container: 'map',
-                    style: config.style,
-                    center: config.center,
-                    zoom: config.zoom
-                }});
-                
-                map.on('load', function() {{
-                    // Añadir fuentes de datos
-                    map.addSource('sectors', {{
-                        type: 'geojson',
-                        data: config.data.data
-                    }});
-                    
-                    // Añadir capas
-                    config.layers.forEach(layer => {{
-                        map.addLayer(layer);
-                    }});
-                    
-                    // Añadir leyenda
-                    if (config.legend.items) {{
-                        const legendItems = document.getElementById('legend-items');
-                        config.legend.items.forEach(item => {{
-                            const div = document.createElement('div');
-                            div.className = 'legend-item';
-                            div.innerHTML = `
-                                <div class="legend-color" style="background-color: ${{item.color}}"></div>
-                                <div>${{item.label}}</div>
-                            `;
-                            legendItems.appendChild(div);
-                        }});
-                    }}
-                    
-                    // Añadir panel de sensibilidad
-                    if (config.sensitivity_panel) {{
-                        document.getElementById('sensitivity-panel').style.display = 'block';
-                        document.getElementById('sensitivity-content').innerHTML = config.sensitivity_panel.content;
-                    }}
-                    
-                    // Añadir estadísticas (ejemplo)
-                    const statsContent = document.getElementById('stats-content');
-                    statsContent.innerHTML = `
-                        <div class="stats-item">Sectores analizados: ${{config.stats ? config.stats.sectors_count : 'N/A'}}</div>
-                        <div class="stats-item">Empresas analizadas: ${{config.stats ? config.stats.companies_count : 'N/A'}}</div>
-                        <div class="stats-item">Preferencia Timbúes: ${{config.stats ? config.stats.timbues_count : 'N/A'}} empresas</div>
-                        <div class="stats-item">Preferencia Lima: ${{config.stats ? config.stats.lima_count : 'N/A'}} empresas</div>
-                        <div class="stats-item">Ahorro potencial total: ${{config.stats ? '$' + (config.stats.total_savings / 1000000).toFixed(2) + 'M' : 'N/A'}}</div>
-                    `;
-                    
-                    // Agregar navegación
-                    map.addControl(new mapboxgl.NavigationControl());
-                    
-                    // Agregar popups para mostrar info al hacer hover
-                    const popup = new mapboxgl.Popup({{
-                        closeButton: false,
-                        closeOnClick: false
-                    }});
-                    
-                    map.on('mouseenter', 'sectors-fill', function(e) {{
-                        map.getCanvas().style.cursor = 'pointer';
-                        
-                        const coordinates = e.lngLat;
-                        const description = e.features[0].properties.description;
-                        
-                        popup.setLngLat(coordinates)
-                            .setHTML(description)
-                            .addTo(map);
-                    }});
-                    
-                    map.on('mouseleave', 'sectors-fill', function() {{
-                        map.getCanvas().style.cursor = '';
-                        popup.remove();
-                    }});
-                }});
-            </script>
-        </body>
-        </html>
-        """
-        
-        return html
+        # El JSON se interpola en el template precompilado; los valores de la
+        # leyenda se preformatean aquí porque no todos los mapas (p. ej. el de
+        # empresas) incluyen min_value/max_value numéricos
+        mapbox_json = _PRETTY_ENCODER(mapbox_config) if pretty else _fast_encode(mapbox_config)
+        legend = mapbox_config.get("legend", {})
+        return _VIZ_TEMPLATE.render(
+            title=title,
+            legend=legend,
+            legend_min_value=f"{legend.get('min_value', 0):.2f}",
+            legend_max_value=f"{legend.get('max_value', 0):.2f}",
+            mapbox_json=mapbox_json,
+            inline_assets=inline_assets,
+            viz_css=_VIZ_CSS,
+            viz_js=_VIZ_JS
+        )
 
 
-# Ejemplo de uso como servidor MCP
-if __name__ == "__main__":
-    import sys
-    import argparse
-    from flask import Flask, request, jsonify, send_file
-    
-    app = Flask(__name__)
+def create_app():
+    """
+    Crea la aplicación Flask del servidor MCP de visualización.
+
+    Expuesta a nivel de módulo para servirla con un servidor WSGI real:
+        gunicorn -w $(nproc) -k gevent 'backend.mcp.viz_mcp:create_app()'
+    """
+    from flask import Flask, request, jsonify, send_from_directory
+
+    # static_folder=None: los activos compartidos viven en backend/static y
+    # se sirven con la ruta propia de abajo
+    app = Flask(__name__, static_folder=None)
+
+    # Compresión a nivel de respuesta para JSON/HTML (5-10x en GeoJSON);
+    # opcional: si flask_compress no está instalado se sirve sin comprimir
+    try:
+        from flask_compress import Compress
+
+        app.config.update(
+            COMPRESS_MIMETYPES=['application/json', 'text/html', 'application/geo+json'],
+            COMPRESS_LEVEL=6,
+            COMPRESS_ALGORITHM=['br', 'gzip']
+        )
+        Compress(app)
+    except ImportError:
+        pass
+
     viz_mcp = MapboxVisualizationMCP()
-    
+
+    # Validación del cuerpo de la solicitud en la entrada: rechazar un
+    # payload malformado cuesta microsegundos, contra construir y capturar
+    # una excepción completa dentro del procesamiento
+    _schema = {
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "minLength": 1},
+            "context": {"type": "object"}
+        },
+        "required": ["action"]
+    }
+
+    try:
+        import fastjsonschema
+
+        _validate = fastjsonschema.compile(_schema)
+        _ValidationError = fastjsonschema.JsonSchemaException
+    except ImportError:
+        # Respaldo mínimo con las mismas garantías que usa el handler
+        _ValidationError = ValueError
+
+        def _validate(data):
+            if not isinstance(data, dict) or \
+               not isinstance(data.get("action"), str) or not data["action"] or \
+               not isinstance(data.get("context", {}), dict):
+                raise _ValidationError("Solicitud malformada")
+            return data
+
+    def _context_key(context: Dict) -> str:
+        """Serializa el contexto con claves ordenadas para usarlo como clave."""
+        if orjson is not None:
+            return orjson.dumps(context, option=orjson.OPT_SORT_KEYS).decode()
+        return json.dumps(context, sort_keys=True)
+
+    class _Uncacheable(Exception):
+        """Transporta un resultado de error para que no quede memoizado."""
+
+        def __init__(self, result: Dict):
+            super().__init__()
+            self.result = result
+
+    # Los refrescos del dashboard reenvían contextos idénticos; cachear el
+    # resultado evita reconstruir la configuración y re-renderizar el HTML.
+    # Los errores (fallas transitorias de disco, tippecanoe, etc.) se
+    # propagan como excepción porque lru_cache no memoiza llamadas que
+    # lanzan: un error puntual no debe quedar pegado para ese contexto
+    @functools.lru_cache(maxsize=256)
+    def _cached_request(action: str, ctx_blob: str) -> Dict:
+        result = viz_mcp.handle_request(action, json.loads(ctx_blob))
+        if isinstance(result, dict) and \
+                ("error" in result or result.get("status") == "error"):
+            raise _Uncacheable(result)
+        return result
+
     @app.route('/mcp/visualization', methods=['POST'])
     def handle_mcp_request():
         """Endpoint para recibir solicitudes MCP."""
+        data = request.get_json(silent=True)
+
         try:
-            data = request.json
-            action = data.get('action')
-            context = data.get('context', {})
-            
-            if not action:
-                return jsonify({"error": "Se requiere una acción"}), 400
-                
-            result = viz_mcp.handle_request(action, context)
+            _validate(data)
+        except _ValidationError as e:
+            return jsonify({"error": f"Solicitud inválida: {str(e)}"}), 400
+
+        action = data['action']
+        context = data.get('context', {})
+
+        # El try/except queda acotado al procesamiento real
+        try:
+            try:
+                result = _cached_request(action, _context_key(context))
+            except _Uncacheable as exc:
+                result = exc.result
+            except TypeError:
+                # Contexto no serializable: se procesa sin cachear
+                result = viz_mcp.handle_request(action, context)
             return jsonify(result)
-            
+
         except Exception as e:
             return jsonify({"error": f"Error: {str(e)}"}), 500
     
     @app.route('/visualizations/<path:filename>', methods=['GET'])
     def serve_visualization(filename):
         """Sirve las visualizaciones HTML generadas."""
-        file_path = os.path.join(viz_mcp.output_dir, filename)
-        return send_file(file_path)
+        # send_from_directory con conditional=True deja que Werkzeug maneje
+        # ETag/If-Modified-Since y responda 304 sin releer el archivo
+        gz_path = os.path.join(viz_mcp.output_dir, filename + ".gz")
+
+        # Si existe la copia .gz escrita al generar la visualización, se
+        # sirve directamente con Content-Encoding en lugar de recomprimir
+        # (o reenviar sin comprimir) en cada solicitud
+        if os.path.exists(gz_path) and \
+           'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = send_from_directory(
+                viz_mcp.output_dir, filename + ".gz",
+                mimetype='text/html', max_age=3600, conditional=True)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers['Vary'] = 'Accept-Encoding'
+        else:
+            response = send_from_directory(
+                viz_mcp.output_dir, filename,
+                max_age=3600, conditional=True)
+
+        # Los nombres de archivo llevan UUID, el contenido nunca cambia
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    @app.route('/static/<path:filename>', methods=['GET'])
+    def serve_static(filename):
+        """Sirve los activos JS/CSS compartidos con caché de larga vida."""
+        # Los activos cambian solo con despliegues nuevos; max-age de un
+        # año evita redescargarlos en cada visualización
+        response = send_from_directory(
+            _STATIC_DIR, filename, max_age=31536000, conditional=True)
+        response.cache_control.public = True
+        return response
+
+    @app.route('/tiles/<viz_id>/<int:z>/<int:x>/<int:y>.pbf', methods=['GET'])
+    def serve_tile(viz_id, z, x, y):
+        """Sirve tiles vectoriales desde el .mbtiles pre-generado."""
+        import sqlite3
+
+        mbtiles_path = os.path.join(viz_mcp.output_dir, f"{viz_id}.mbtiles")
+        if not os.path.exists(mbtiles_path):
+            return jsonify({"error": "Tiles no disponibles"}), 404
+
+        # mbtiles usa el esquema TMS: la fila está invertida respecto a XYZ
+        row = (2 ** z - 1) - y
+
+        conn = sqlite3.connect(mbtiles_path)
+        try:
+            result = conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (z, x, row)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        if result is None:
+            return ('', 204)
+
+        # tippecanoe guarda los tiles ya comprimidos con gzip
+        return result[0], 200, {
+            "Content-Type": "application/x-protobuf",
+            "Content-Encoding": "gzip"
+        }
     
+    return app
+
+
+# Ejemplo de uso como servidor MCP
+if __name__ == "__main__":
+    import argparse
+
     parser = argparse.ArgumentParser(description='Servidor MCP para visualización con Mapbox')
     parser.add_argument('--host', default='0.0.0.0', help='Host para el servidor Flask')
     parser.add_argument('--port', type=int, default=5002, help='Puerto para el servidor Flask')
     parser.add_argument('--debug', action='store_true', help='Ejecutar en modo debug')
-    
+
     args = parser.parse_args()
-    
-    app.run(host=args.host, port=args.port, debug=args.debug)
\ No newline at end of file
+
+    if args.debug:
+        # El servidor de desarrollo de Flask solo para depuración: atiende
+        # una solicitud a la vez
+        create_app().run(host=args.host, port=args.port, debug=True)
+    elif shutil.which("gunicorn"):
+        # En producción, un worker por núcleo para atender generaciones de
+        # visualizaciones concurrentes
+        os.execvp("gunicorn", [
+            "gunicorn",
+            "-w", str(os.cpu_count() or 1),
+            "--bind", f"{args.host}:{args.port}",
+            "backend.mcp.viz_mcp:create_app()"
+        ])
+    else:
+        create_app().run(host=args.host, port=args.port)
\ No newline at end of file
@@ -0,0 +1,123 @@
+// Inicialización del mapa de visualización. La configuración llega vía
+// window.__cfg (inyectada por el HTML generado); este archivo es estático
+// y cacheable con max-age largo.
+function initMap(config) {
+    // Si los datos van por URL, la descarga arranca ya mismo, en
+    // paralelo con la construcción del mapa (sin cascada de carga)
+    const dataPromise = (config.data && config.data.dataUrl)
+        ? fetch(config.data.dataUrl).then(r => r.json())
+        : null;
+
+    // Inicializar mapa
+    mapboxgl.accessToken = config.accessToken;
+    const map = new mapboxgl.Map({
+        container: 'map',
+        style: config.style,
+        center: config.center,
+        zoom: config.zoom
+    });
+
+    map.on('load', async function() {
+        // Añadir fuente de datos: config.data ya es un objeto de fuente
+        // válido, sea GeoJSON inline o tiles vectoriales pre-generados
+        if (dataPromise) {
+            config.data.data = await dataPromise;
+            delete config.data.dataUrl;
+        }
+        map.addSource('sectors', config.data);
+
+        // Añadir capas
+        config.layers.forEach(layer => {
+            map.addLayer(layer);
+        });
+
+        // Añadir leyenda: se arma en un DocumentFragment y se inserta
+        // de una sola vez, un único reflow en lugar de uno por item
+        if (config.legend.items) {
+            const legendItems = document.getElementById('legend-items');
+            const frag = document.createDocumentFragment();
+            for (const item of config.legend.items) {
+                const div = document.createElement('div');
+                div.className = 'legend-item';
+                div.innerHTML = `
+                    <div class="legend-color" style="background-color: ${item.color}"></div>
+                    <div>${item.label}</div>
+                `;
+                frag.appendChild(div);
+            }
+            legendItems.appendChild(frag);
+        }
+
+        // Añadir panel de sensibilidad
+        if (config.sensitivity_panel) {
+            document.getElementById('sensitivity-panel').style.display = 'block';
+            document.getElementById('sensitivity-content').innerHTML = config.sensitivity_panel.content;
+        }
+
+        // Añadir estadísticas (ejemplo)
+        const statsContent = document.getElementById('stats-content');
+        statsContent.innerHTML = `
+            <div class="stats-item">Sectores analizados: ${config.stats ? config.stats.sectors_count : 'N/A'}</div>
+            <div class="stats-item">Empresas analizadas: ${config.stats ? config.stats.companies_count : 'N/A'}</div>
+            <div class="stats-item">Preferencia Timbúes: ${config.stats ? config.stats.timbues_count : 'N/A'} empresas</div>
+            <div class="stats-item">Preferencia Lima: ${config.stats ? config.stats.lima_count : 'N/A'} empresas</div>
+            <div class="stats-item">Ahorro potencial total: ${config.stats ? '$' + (config.stats.total_savings / 1000000).toFixed(2) + 'M' : 'N/A'}</div>
+        `;
+
+        // Agregar navegación
+        map.addControl(new mapboxgl.NavigationControl());
+
+        // Agregar popups para mostrar info al hacer hover
+        const popup = new mapboxgl.Popup({
+            closeButton: false,
+            closeOnClick: false
+        });
+
+        let hoveredId = null;
+
+        // El mousemove puede dispararse a más de 200 Hz; el gate de
+        // requestAnimationFrame limita el trabajo a un refresco por
+        // frame (60 Hz)
+        let raf = 0;
+        map.on('mousemove', 'sectors-fill', function(e) {
+            if (raf) return;
+            const feature = e.features[0];
+            const coordinates = e.lngLat;
+            raf = requestAnimationFrame(() => {
+                raf = 0;
+                map.getCanvas().style.cursor = 'pointer';
+
+                // Resaltado vía feature-state: el estilo lo lee sin
+                // reconstruir la fuente ni agregar capas dinámicas
+                if (hoveredId !== null && hoveredId !== feature.id) {
+                    map.setFeatureState({source: 'sectors', id: hoveredId}, {hover: false});
+                }
+                hoveredId = feature.id;
+                map.setFeatureState({source: 'sectors', id: hoveredId}, {hover: true});
+
+                popup.setLngLat(coordinates)
+                    .setHTML(feature.properties.description)
+                    .addTo(map);
+            });
+        });
+
+        map.on('mouseleave', 'sectors-fill', function() {
+            map.getCanvas().style.cursor = '';
+            if (hoveredId !== null) {
+                map.setFeatureState({source: 'sectors', id: hoveredId}, {hover: false});
+                hoveredId = null;
+            }
+            popup.remove();
+        });
+
+        // Refresco incremental: reutiliza la fuente existente en lugar
+        // de desmontar y reconstruir el mapa
+        window.updateData = function(geojson) {
+            map.getSource('sectors').setData(geojson);
+        };
+    });
+}
+
+if (typeof window !== 'undefined' && window.__cfg) {
+    initMap(window.__cfg);
+}
@@ -6,6 +6,7 @@ de productos utilizando diferentes puertos y rutas.
 """
 
 import logging
+import numpy as np
 from typing import Dict, List, Tuple, Optional, Union
 from config.default import (
     COSTOS_FIJOS_TIMBUES,
@@ -20,6 +21,31 @@ from config.default import (
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Kernel opcional compilado con Numba: produce el desglose y el total en una
+# sola pasada fusionada sobre memoria (sin arrays temporales) paralelizada
+# con prange; el total sale de los mismos componentes que se devuelven, así
+# que siempre coincide exactamente con la suma del desglose. Si Numba no
+# está instalado se usa la vía NumPy normal.
+try:
+    from numba import njit, prange
+
+    @njit(parallel=True, cache=True)
+    def _cost_kernel(distancias, toneladas, factor_correccion,
+                     tarifa_terrestre, tarifa_maritima, costos_fijos):
+        flete_terrestre = np.empty_like(distancias)
+        flete_maritimo = np.empty_like(distancias)
+        total = np.empty_like(distancias)
+        for i in prange(distancias.size):
+            ft = distancias[i] * factor_correccion * tarifa_terrestre * toneladas[i]
+            fm = tarifa_maritima * toneladas[i]
+            flete_terrestre[i] = ft
+            flete_maritimo[i] = fm
+            total[i] = ft + fm + costos_fijos[i]
+        return flete_terrestre, flete_maritimo, total
+
+except ImportError:
+    _cost_kernel = None
+
 class CostCalculator:
     """Clase para calcular costos de exportación vía diferentes puertos."""
     
@@ -49,6 +75,11 @@ class CostCalculator:
         self.tarifa_flete_terrestre_base = tarifa_flete_terrestre_base
         self.factor_correccion_timbues = factor_correccion_timbues
         self.factor_correccion_lima = factor_correccion_lima
+
+        # Los costos fijos no cambian después de la construcción: precalcular
+        # sus totales una sola vez en lugar de sumarlos en cada cálculo
+        self._total_costos_fijos_timbues = sum(costos_fijos_timbues.values())
+        self._total_costos_fijos_lima = sum(costos_fijos_lima.values())
     
     def calcular_costo_total_exportacion(self, 
                                         puerto: str,
@@ -78,34 +109,23 @@ class CostCalculator:
         try:
             # Seleccionar parámetros según puerto
             if puerto.lower() == 'timbues':
-                costos_fijos = self.costos_fijos_timbues
+                total_costos_fijos = self._total_costos_fijos_timbues
                 tarifa_flete_maritimo = self.tarifa_flete_maritimo_timbues
                 factor_correccion = self.factor_correccion_timbues
             else:  # 'lima'
-                costos_fijos = self.costos_fijos_lima
+                total_costos_fijos = self._total_costos_fijos_lima
                 tarifa_flete_maritimo = self.tarifa_flete_maritimo_lima
                 factor_correccion = self.factor_correccion_lima
-            
+
             # Calcular costo de flete terrestre
             distancia_ajustada = distancia_terrestre * factor_correccion
             costo_flete_terrestre = distancia_ajustada * self.tarifa_flete_terrestre_base * toneladas
-            
+
             # Calcular costo de flete marítimo
             costo_flete_maritimo = tarifa_flete_maritimo * toneladas
-            
-            # Calcular costos fijos totales
-            if es_contenedor:
-                # Para carga en contenedores
-                costo_fijo_total = sum([
-                    costos_fijos.get(concepto, 0) * contenedores 
-                    for concepto in costos_fijos
-                ])
-            else:
-                # Para carga a granel
-                costo_fijo_total = sum([
-                    costos_fijos.get(concepto, 0) 
-                    for concepto in costos_fijos
-                ])
+
+            # Calcular costos fijos totales (por contenedor o a granel)
+            costo_fijo_total = total_costos_fijos * (contenedores if es_contenedor else 1)
             
             # Calcular costo total
             costo_total = costo_flete_terrestre + costo_flete_maritimo + costo_fijo_total
@@ -134,6 +154,91 @@ class CostCalculator:
                 "costo_total": None
             }
     
+    def calcular_costos_batch(self,
+                             puerto: str,
+                             distancias: np.ndarray,
+                             toneladas: np.ndarray,
+                             es_contenedor: bool = False,
+                             contenedores: Optional[np.ndarray] = None) -> Dict:
+        """Calcular costos de exportación para un lote de orígenes.
+
+        Versión vectorizada de `calcular_costo_total_exportacion`: acepta
+        arrays de NumPy y calcula todos los sectores en una sola pasada,
+        evitando una llamada Python por sector. No se redondea dentro del
+        cálculo; el redondeo corresponde a la capa de serialización.
+
+        Args:
+            puerto: Puerto de exportación ('timbues' o 'lima').
+            distancias: Array de distancias terrestres en km.
+            toneladas: Array de cantidades de producto en toneladas.
+            es_contenedor: Si es True, se calcula por contenedor en lugar de granel.
+            contenedores: Array con número de contenedores (solo si es_contenedor=True).
+
+        Returns:
+            Diccionario con arrays de desglose de costos y costo total.
+        """
+        if puerto.lower() not in ['timbues', 'lima']:
+            return {
+                "status": "error",
+                "message": "Puerto no válido. Opciones: 'timbues' o 'lima'",
+                "costo_total": None
+            }
+
+        try:
+            # Seleccionar parámetros según puerto (una sola vez para el lote)
+            if puerto.lower() == 'timbues':
+                total_costos_fijos = self._total_costos_fijos_timbues
+                tarifa_flete_maritimo = self.tarifa_flete_maritimo_timbues
+                factor_correccion = self.factor_correccion_timbues
+            else:  # 'lima'
+                total_costos_fijos = self._total_costos_fijos_lima
+                tarifa_flete_maritimo = self.tarifa_flete_maritimo_lima
+                factor_correccion = self.factor_correccion_lima
+
+            distancias = np.asarray(distancias, dtype=np.float64)
+            toneladas = np.asarray(toneladas, dtype=np.float64)
+
+            distancias_ajustadas = distancias * factor_correccion
+
+            if es_contenedor:
+                costos_fijos = total_costos_fijos * np.asarray(contenedores, dtype=np.float64)
+            else:
+                costos_fijos = np.full_like(distancias, total_costos_fijos)
+
+            if _cost_kernel is not None:
+                # Desglose y total en una sola pasada fusionada; la vía
+                # NumPy no se ejecuta en paralelo para no duplicar trabajo
+                flete_terrestre, flete_maritimo, costo_total = _cost_kernel(
+                    distancias, toneladas, factor_correccion,
+                    self.tarifa_flete_terrestre_base, tarifa_flete_maritimo,
+                    costos_fijos
+                )
+            else:
+                flete_terrestre = distancias_ajustadas * self.tarifa_flete_terrestre_base * toneladas
+                flete_maritimo = tarifa_flete_maritimo * toneladas
+                costo_total = flete_terrestre + flete_maritimo + costos_fijos
+
+            return {
+                "status": "success",
+                "puerto": puerto,
+                "toneladas": toneladas,
+                "distancia_terrestre": distancias,
+                "distancia_ajustada": distancias_ajustadas,
+                "flete_terrestre": flete_terrestre,
+                "flete_maritimo": flete_maritimo,
+                "costos_fijos": costos_fijos,
+                "costo_total": costo_total,
+                "costo_unitario": costo_total / toneladas
+            }
+
+        except Exception as e:
+            logger.error(f"Error en cálculo de costos por lote: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Error en cálculo de costos por lote: {str(e)}",
+                "costo_total": None
+            }
+
     def comparar_costos_puertos(self,
                               distancia_timbues: float,
                               distancia_lima: float,
@@ -201,6 +306,84 @@ class CostCalculator:
                 "lima": None
             }
     
+    def comparar_batch(self,
+                      distancias_timbues: np.ndarray,
+                      distancias_lima: np.ndarray,
+                      toneladas: np.ndarray,
+                      es_contenedor: bool = False,
+                      contenedores: Optional[np.ndarray] = None) -> Dict:
+        """Comparar costos entre puertos para un lote de orígenes.
+
+        Versión vectorizada de `comparar_costos_puertos` que además deriva el
+        punto de equilibrio de cada origen con la solución cerrada, evitando
+        un bucle Python por sector en los análisis de mapa completo.
+
+        Args:
+            distancias_timbues: Array de distancias terrestres a Timbúes en km.
+            distancias_lima: Array de distancias terrestres a Lima en km.
+            toneladas: Array de cantidades de producto en toneladas.
+            es_contenedor: Si es True, se calcula por contenedor en lugar de granel.
+            contenedores: Array con número de contenedores (solo si es_contenedor=True).
+
+        Returns:
+            Diccionario con arrays de costos por puerto, diferenciales,
+            puerto óptimo y punto de equilibrio por origen.
+        """
+        try:
+            resultado_timbues = self.calcular_costos_batch(
+                'timbues', distancias_timbues, toneladas, es_contenedor, contenedores
+            )
+            resultado_lima = self.calcular_costos_batch(
+                'lima', distancias_lima, toneladas, es_contenedor, contenedores
+            )
+
+            if resultado_timbues["status"] != "success" or resultado_lima["status"] != "success":
+                return {
+                    "status": "error",
+                    "message": "Error en el cálculo de costos para uno o ambos puertos",
+                    "timbues": resultado_timbues,
+                    "lima": resultado_lima
+                }
+
+            costos_timbues = resultado_timbues["costo_total"]
+            costos_lima = resultado_lima["costo_total"]
+
+            diferencia = costos_lima - costos_timbues
+            puerto_optimo = np.where(diferencia > 0, 'timbues', 'lima')
+
+            # Punto de equilibrio por origen con la descomposición lineal
+            # costo_timbues(d) = A·d + B
+            toneladas = np.asarray(toneladas, dtype=np.float64)
+            pendiente = (self.factor_correccion_timbues *
+                        self.tarifa_flete_terrestre_base * toneladas)
+            costo_base = (self.tarifa_flete_maritimo_timbues * toneladas +
+                         resultado_timbues["costos_fijos"])
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                punto_equilibrio = np.where(
+                    pendiente > 0,
+                    (costos_lima - costo_base) / pendiente,
+                    np.nan
+                )
+
+            return {
+                "status": "success",
+                "timbues": resultado_timbues,
+                "lima": resultado_lima,
+                "diferencia": diferencia,
+                "puerto_optimo": puerto_optimo,
+                "punto_equilibrio": punto_equilibrio
+            }
+
+        except Exception as e:
+            logger.error(f"Error en comparación de costos por lote: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Error en comparación de costos por lote: {str(e)}",
+                "timbues": None,
+                "lima": None
+            }
+
     def calcular_punto_equilibrio(self,
                                 distancia_lima: float,
                                 toneladas: float,
@@ -208,81 +391,78 @@ class CostCalculator:
                                 contenedores: int = 0,
                                 precision: float = 0.1) -> Dict:
         """Calcular punto de equilibrio entre ambos puertos.
-        
+
         Encuentra la distancia a Timbúes donde el costo es igual al de Lima.
-        
+        Como el costo total es lineal en la distancia terrestre
+        (costo(d) = A·d + B), el punto de equilibrio se resuelve de forma
+        cerrada en lugar de iterar por bisección.
+
         Args:
             distancia_lima: Distancia terrestre a Lima en km.
             toneladas: Cantidad de producto en toneladas.
             es_contenedor: Si es True, se calcula por contenedor.
             contenedores: Número de contenedores (solo si es_contenedor=True).
-            precision: Precisión deseada en km.
-            
+            precision: Mantenido por compatibilidad; la solución cerrada es exacta.
+
         Returns:
             Diccionario con punto de equilibrio y detalles.
         """
         try:
-            # Método de bisección para encontrar el punto de equilibrio
-            min_dist = 0.0
             max_dist = 2000.0  # Distancia máxima razonable en Argentina
-            
-            # Verificar si Lima es más barato incluso a distancia cero a Timbúes
-            comparacion_min = self.comparar_costos_puertos(
-                min_dist, distancia_lima, toneladas, es_contenedor, contenedores
+
+            # Costo de referencia para Lima (no depende de la distancia a Timbúes)
+            resultado_lima = self.calcular_costo_total_exportacion(
+                'lima', distancia_lima, toneladas, es_contenedor, contenedores
             )
-            
-            if comparacion_min["status"] != "success":
+
+            if resultado_lima["status"] != "success":
                 return {
                     "status": "error",
                     "message": "Error en el cálculo inicial de comparación",
                     "punto_equilibrio": None
                 }
-            
-            if comparacion_min["comparacion"]["puerto_optimo"] == "lima":
+
+            costo_lima = resultado_lima["costo_total"]
+
+            # Descomposición lineal del costo de Timbúes: costo(d) = A·d + B
+            pendiente = (self.factor_correccion_timbues *
+                        self.tarifa_flete_terrestre_base * toneladas)
+            costo_fijo_timbues = self._total_costos_fijos_timbues * \
+                (contenedores if es_contenedor else 1)
+            costo_base = self.tarifa_flete_maritimo_timbues * toneladas + costo_fijo_timbues
+
+            if pendiente <= 0:
+                return {
+                    "status": "error",
+                    "message": "No se puede calcular el punto de equilibrio sin carga",
+                    "punto_equilibrio": None
+                }
+
+            # Resolver A·d + B = costo_lima
+            punto_equilibrio = (costo_lima - costo_base) / pendiente
+
+            # Verificar si Lima es más barato incluso a distancia cero a Timbúes
+            if punto_equilibrio < 0:
                 return {
                     "status": "success",
                     "mensaje": "El puerto de Lima es siempre más conveniente para este caso",
                     "punto_equilibrio": None,
-                    "comparacion_referencia": comparacion_min
+                    "comparacion_referencia": self.comparar_costos_puertos(
+                        0.0, distancia_lima, toneladas, es_contenedor, contenedores
+                    )
                 }
-            
+
             # Verificar si Timbúes es más barato incluso a distancia máxima
-            comparacion_max = self.comparar_costos_puertos(
-                max_dist, distancia_lima, toneladas, es_contenedor, contenedores
-            )
-            
-            if comparacion_max["comparacion"]["puerto_optimo"] == "timbues":
+            if punto_equilibrio > max_dist:
                 return {
                     "status": "success",
                     "mensaje": "El puerto de Timbúes es siempre más conveniente para este caso",
                     "punto_equilibrio": None,
-                    "comparacion_referencia": comparacion_max
+                    "comparacion_referencia": self.comparar_costos_puertos(
+                        max_dist, distancia_lima, toneladas, es_contenedor, contenedores
+                    )
                 }
-            
-            # Buscar el punto de equilibrio mediante bisección
-            while (max_dist - min_dist) > precision:
-                mid_dist = (min_dist + max_dist) / 2
-                
-                comparacion = self.comparar_costos_puertos(
-                    mid_dist, distancia_lima, toneladas, es_contenedor, contenedores
-                )
-                
-                if comparacion["status"] != "success":
-                    return {
-                        "status": "error",
-                        "message": "Error en el cálculo de comparación durante la bisección",
-                        "punto_equilibrio": None
-                    }
-                
-                # Ajustar los límites según el resultado
-                if comparacion["comparacion"]["puerto_optimo"] == "timbues":
-                    min_dist = mid_dist
-                else:
-                    max_dist = mid_dist
-            
-            # Calcular el punto final con precisión aceptable
-            punto_equilibrio = (min_dist + max_dist) / 2
-            
+
             # Calcular costos en el punto de equilibrio
             comparacion_equilibrio = self.comparar_costos_puertos(
                 punto_equilibrio, distancia_lima, toneladas, es_contenedor, contenedores
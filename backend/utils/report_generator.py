@@ -6,301 +6,219 @@ de costos y rutas de exportación.
 """
 
 import io
+import os
 import json
+import base64
 import logging
 import datetime
-import pandas as pd
-from typing import Dict, List, Tuple, Optional, Union
-from weasyprint import HTML, CSS
-from jinja2 import Template
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from typing import BinaryIO, Dict, List, Tuple, Optional, Union
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Formateadores reutilizables: resolver el spec de formato una sola vez en un
+# bound method evita re-parsear el mini-lenguaje de formato en cada f-string
+_USD = "${:,.2f}".format
+_KM = "{:,.1f}".format
+_PCT = "{:.1f}%".format
+_TON = "{:,.2f}".format
+
+# La plantilla HTML vive en templates/report.html; el caché de bytecode
+# persiste el template compilado entre procesos, de modo que los arranques
+# tibios se ahorran el parseo completo
+_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+_BYTECODE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "jinja_cache")
+
+# Hoja de estilos del reporte, separada de la plantilla HTML. WeasyPrint la
+# parsea una sola vez al importar el módulo y la reutiliza en cada PDF, en
+# lugar de re-analizar el bloque <style> embebido reporte por reporte
+REPORT_CSS = """\
+body {
+    font-family: 'Helvetica', 'Arial', sans-serif;
+    line-height: 1.6;
+    color: #333;
+    margin: 0;
+    padding: 20px;
+}
+.header {
+    text-align: center;
+    margin-bottom: 30px;
+    border-bottom: 1px solid #ddd;
+    padding-bottom: 10px;
+}
+.header h1 {
+    color: #2c3e50;
+    margin-bottom: 10px;
+}
+.header .date {
+    color: #7f8c8d;
+    font-size: 14px;
+}
+.content {
+    margin-bottom: 30px;
+}
+h2 {
+    color: #2980b9;
+    border-bottom: 1px solid #eee;
+    padding-bottom: 5px;
+}
+h3 {
+    color: #3498db;
+}
+table {
+    width: 100%;
+    border-collapse: collapse;
+    margin: 20px 0;
+}
+table, th, td {
+    border: 1px solid #ddd;
+}
+th {
+    background-color: #f2f2f2;
+    padding: 10px;
+    text-align: left;
+}
+td {
+    padding: 8px;
+}
+.info-box {
+    background-color: #f8f9fa;
+    border: 1px solid #e9ecef;
+    border-radius: 5px;
+    padding: 15px;
+    margin: 15px 0;
+}
+.result-box {
+    background-color: #e8f4f8;
+    border: 1px solid #d1e7f0;
+    border-radius: 5px;
+    padding: 15px;
+    margin: 15px 0;
+}
+.result-box.highlight {
+    background-color: #d4edda;
+    border-color: #c3e6cb;
+}
+.img-container {
+    text-align: center;
+    margin: 20px 0;
+}
+.img-container img {
+    max-width: 100%;
+    height: auto;
+}
+.footer {
+    text-align: center;
+    font-size: 12px;
+    color: #7f8c8d;
+    margin-top: 30px;
+    border-top: 1px solid #ddd;
+    padding-top: 10px;
+}
+.page-break {
+    page-break-after: always;
+}
+@media print {
+    body {
+        padding: 0;
+    }
+    h2, h3 {
+        page-break-after: avoid;
+    }
+    .img-container {
+        page-break-inside: avoid;
+    }
+}
+"""
+
+# WeasyPrint arrastra cairo/pango/GObject (cientos de ms de import); se
+# carga recién en el primer PDF y se cachea junto con la hoja de estilos ya
+# parseada y una FontConfiguration compartida (sin ella, cada write_pdf
+# vuelve a sondear las fuentes del sistema vía fontconfig)
+_HTML = None
+_CSS_OBJ = None
+_FONT_CONFIG = None
+
+
+@lru_cache(maxsize=256)
+def _b64(img_bytes: bytes) -> str:
+    """Codificar bytes de imagen a base64, con caché por contenido.
+
+    Los gráficos de comparación/desglose se repiten entre reportes con los
+    mismos parámetros; cachear por contenido evita recodificar el mismo PNG.
+    """
+    return base64.b64encode(img_bytes).decode("ascii")
+
+
+def _no_net(url, *args, **kwargs):
+    """Fetcher de URLs que solo resuelve data: URIs.
+
+    El fetcher por defecto de WeasyPrint descarga de forma síncrona
+    cualquier URL externa que aparezca en el HTML; un <img> perdido con
+    http:// estancaría el render. Las imágenes del reporte van siempre
+    inline en base64, así que todo lo demás se bloquea de entrada.
+    """
+    if url.startswith("data:"):
+        from weasyprint import default_url_fetcher
+        return default_url_fetcher(url, *args, **kwargs)
+    raise ValueError(f"URL bloqueada en el reporte: {url}")
+
+
+def _get_weasyprint():
+    """Importar WeasyPrint en el primer uso y cachear HTML, CSS y fuentes."""
+    global _HTML, _CSS_OBJ, _FONT_CONFIG
+    if _HTML is None:
+        from weasyprint import HTML, CSS
+        from weasyprint.text.fonts import FontConfiguration
+        _FONT_CONFIG = FontConfiguration()
+        _HTML = HTML
+        _CSS_OBJ = CSS(string=REPORT_CSS, font_config=_FONT_CONFIG)
+    return _HTML, _CSS_OBJ, _FONT_CONFIG
+
+
 class ReportGenerator:
     """Clase para generar reportes de análisis de exportación."""
-    
+
+    # Entorno y plantilla compilada compartidos a nivel de clase: código que
+    # instancia un generador por request (endpoints, workers) reutiliza la
+    # misma plantilla en lugar de recompilarla en cada __init__
+    _env: Optional[Environment] = None
+    _compiled_template = None
+
     def __init__(self):
         """Inicializar generador de reportes."""
-        self.today = datetime.datetime.now().strftime("%d/%m/%Y")
-        self.report_template = self._get_default_template()
-    
-    def _get_default_template(self) -> str:
-        """Obtener plantilla HTML por defecto para reportes.
-        
-        Returns:
-            String con plantilla HTML para el reporte.
-        """
-        return """
-        <!DOCTYPE html>
-        <html lang="es">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>{{ titulo }}</title>
-            <style>
-                body {
-                    font-family: 'Helvetica', 'Arial', sans-serif;
-                    line-height: 1.6;
-                    color: #333;
-                    margin: 0;
-                    padding: 20px;
-                }
-                .header {
-                    text-align: center;
-                    margin-bottom: 30px;
-                    border-bottom: 1px solid #ddd;
-                    padding-bottom: 10px;
-                }
-                .header h1 {
-                    color: #2c3e50;
-                    margin-bottom: 10px;
-                }
-                .header .date {
-                    color: #7f8c8d;
-                    font-size: 14px;
-                }
-                .content {
-                    margin-bottom: 30px;
-                }
-                h2 {
-                    color: #2980b9;
-                    border-bottom: 1px solid #eee;
-                    padding-bottom: 5px;
-                }
-                h3 {
-                    color: #3498db;
-                }
-                table {
-                    width: 100%;
-                    border-collapse: collapse;
-                    margin: 20px 0;
-                }
-                table, th, td {
-                    border: 1px solid #ddd;
-                }
-                th {
-                    background-color: #f2f2f2;
-                    padding: 10px;
-                    text-align: left;
-                }
-                td {
-                    padding: 8px;
-                }
-                .info-box {
-                    background-color: #f8f9fa;
-                    border: 1px solid #e9ecef;
-                    border-radius: 5px;
-                    padding: 15px;
-                    margin: 15px 0;
-                }
-                .result-box {
-                    background-color: #e8f4f8;
-                    border: 1px solid #d1e7f0;
-                    border-radius: 5px;
-                    padding: 15px;
-                    margin: 15px 0;
-                }
-                .result-box.highlight {
-                    background-color: #d4edda;
-                    border-color: #c3e6cb;
-                }
-                .img-container {
-                    text-align: center;
-                    margin: 20px 0;
-                }
-                .img-container img {
-                    max-width: 100%;
-                    height: auto;
-                }
-                .footer {
-                    text-align: center;
-                    font-size: 12px;
-                    color: #7f8c8d;
-                    margin-top: 30px;
-                    border-top: 1px solid #ddd;
-                    padding-top: 10px;
-                }
-                .page-break {
-                    page-break-after: always;
-                }
-                @media print {
-                    body {
-                        padding: 0;
-                    }
-                    h2, h3 {
-                        page-break-after: avoid;
-                    }
-                    .img-container {
-                        page-break-inside: avoid;
-                    }
-                }
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>{{ titulo }}</h1>
-                <div class="date">Fecha: {{ fecha }}</div>
-            </div>
-            
-            <div class="content">
-                <h2>Resumen Ejecutivo</h2>
-                <div class="info-box">
-                    {{ resumen_ejecutivo }}
-                </div>
-                
-                <h2>Parámetros del Análisis</h2>
-                <table>
-                    <tr>
-                        <th>Parámetro</th>
-                        <th>Valor</th>
-                    </tr>
-                    {% for param in parametros %}
-                    <tr>
-                        <td>{{ param.nombre }}</td>
-                        <td>{{ param.valor }}</td>
-                    </tr>
-                    {% endfor %}
-                </table>
-                
-                <h2>Análisis de Rutas</h2>
-                <div class="info-box">
-                    <p>{{ analisis_rutas.descripcion }}</p>
-                    
-                    <h3>Distancias</h3>
-                    <table>
-                        <tr>
-                            <th>Ruta</th>
-                            <th>Distancia (km)</th>
-                            <th>Tiempo Estimado</th>
-                        </tr>
-                        {% for ruta in analisis_rutas.distancias %}
-                        <tr>
-                            <td>{{ ruta.nombre }}</td>
-                            <td>{{ ruta.distancia }}</td>
-                            <td>{{ ruta.tiempo }}</td>
-                        </tr>
-                        {% endfor %}
-                    </table>
-                    
-                    {% if analisis_rutas.mapa %}
-                    <div class="img-container">
-                        <h3>Mapa de Rutas</h3>
-                        {{ analisis_rutas.mapa|safe }}
-                    </div>
-                    {% endif %}
-                </div>
-                
-                <div class="page-break"></div>
-                
-                <h2>Análisis de Costos</h2>
-                <div class="info-box">
-                    <p>{{ analisis_costos.descripcion }}</p>
-                    
-                    <h3>Detalle de Costos por Puerto</h3>
-                    <table>
-                        <tr>
-                            <th>Concepto</th>
-                            <th>Timbúes (USD)</th>
-                            <th>Lima (USD)</th>
-                        </tr>
-                        {% for item in analisis_costos.detalles %}
-                        <tr>
-                            <td>{{ item.concepto }}</td>
-                            <td>{{ item.timbues }}</td>
-                            <td>{{ item.lima }}</td>
-                        </tr>
-                        {% endfor %}
-                        <tr>
-                            <th>Total</th>
-                            <th>{{ analisis_costos.total_timbues }}</th>
-                            <th>{{ analisis_costos.total_lima }}</th>
-                        </tr>
-                    </table>
-                    
-                    {% if analisis_costos.imagen_comparacion %}
-                    <div class="img-container">
-                        <h3>Comparación Gráfica de Costos</h3>
-                        <img src="data:image/png;base64,{{ analisis_costos.imagen_comparacion }}" alt="Comparación de costos">
-                    </div>
-                    {% endif %}
-                    
-                    {% if analisis_costos.imagen_desglose_timbues %}
-                    <div class="img-container">
-                        <h3>Desglose de Costos - Timbúes</h3>
-                        <img src="data:image/png;base64,{{ analisis_costos.imagen_desglose_timbues }}" alt="Desglose de costos Timbúes">
-                    </div>
-                    {% endif %}
-                    
-                    {% if analisis_costos.imagen_desglose_lima %}
-                    <div class="img-container">
-                        <h3>Desglose de Costos - Lima</h3>
-                        <img src="data:image/png;base64,{{ analisis_costos.imagen_desglose_lima }}" alt="Desglose de costos Lima">
-                    </div>
-                    {% endif %}
-                </div>
-                
-                <div class="page-break"></div>
-                
-                <h2>Conclusiones</h2>
-                <div class="result-box {% if conclusiones.puerto_optimo %}highlight{% endif %}">
-                    <h3>Puerto Óptimo: {{ conclusiones.puerto_optimo }}</h3>
-                    <p>{{ conclusiones.justificacion }}</p>
-                    
-                    <h3>Resumen Comparativo</h3>
-                    <table>
-                        <tr>
-                            <th>Métrica</th>
-                            <th>Valor</th>
-                        </tr>
-                        {% for metrica in conclusiones.metricas %}
-                        <tr>
-                            <td>{{ metrica.nombre }}</td>
-                            <td>{{ metrica.valor }}</td>
-                        </tr>
-                        {% endfor %}
-                    </table>
-                    
-                    {% if conclusiones.recomendaciones %}
-                    <h3>Recomendaciones</h3>
-                    <ul>
-                        {% for rec in conclusiones.recomendaciones %}
-                        <li>{{ rec }}</li>
-                        {% endfor %}
-                    </ul>
-                    {% endif %}
-                </div>
-                
-                {% if analisis_sensibilidad %}
-                <h2>Análisis de Sensibilidad</h2>
-                <div class="info-box">
-                    <p>{{ analisis_sensibilidad.descripcion }}</p>
-                    
-                    {% for analisis in analisis_sensibilidad.analisis %}
-                    <h3>{{ analisis.titulo }}</h3>
-                    <p>{{ analisis.descripcion }}</p>
-                    
-                    {% if analisis.imagen %}
-                    <div class="img-container">
-                        <img src="data:image/png;base64,{{ analisis.imagen }}" alt="{{ analisis.titulo }}">
-                    </div>
-                    {% endif %}
-                    
-                    <div class="result-box">
-                        <p>{{ analisis.conclusion }}</p>
-                    </div>
-                    {% endfor %}
-                </div>
-                {% endif %}
-            </div>
-            
-            <div class="footer">
-                <p>Reporte generado automáticamente por el sistema de análisis de rutas de exportación.</p>
-                <p>{{ fecha }} | Proyecto Puerto Lima</p>
-            </div>
-        </body>
-        </html>
+        if type(self)._compiled_template is None:
+            # Compilar la plantilla una sola vez por proceso: el lexer/parser
+            # de Jinja sobre ~200 líneas de HTML es costo puro si se repite.
+            # El bytecode cache en disco evita incluso la compilación inicial
+            # en procesos nuevos (workers, batch)
+            os.makedirs(_BYTECODE_CACHE_DIR, exist_ok=True)
+            # trim/lstrip_blocks acortan la lista de nodos compilada (menos
+            # emisiones de whitespace por render); auto_reload=False evita el
+            # stat() del template en cada get_template
+            type(self)._env = Environment(
+                loader=FileSystemLoader(_TEMPLATES_DIR),
+                bytecode_cache=FileSystemBytecodeCache(_BYTECODE_CACHE_DIR),
+                autoescape=True,
+                trim_blocks=True,
+                lstrip_blocks=True,
+                auto_reload=False,
+                cache_size=400
+            )
+            type(self)._compiled_template = type(self)._env.get_template("report.html")
+
+    @property
+    def today(self) -> str:
+        """Fecha actual formateada, evaluada en cada acceso.
+
+        Como propiedad no queda congelada en __init__: un generador
+        longevo (worker) siempre fecha los reportes con el día real.
         """
+        return datetime.datetime.now().strftime("%d/%m/%Y")
 
     def generar_reporte_comparacion(self,
                                   origen: str,
@@ -310,9 +228,12 @@ class ReportGenerator:
                                   ruta_timbues: Optional[Dict] = None,
                                   ruta_lima: Optional[Dict] = None,
                                   imagenes: Optional[Dict] = None,
-                                  analisis_sensibilidad: Optional[List[Dict]] = None) -> Dict:
+                                  analisis_sensibilidad: Optional[List[Dict]] = None,
+                                  output: Optional[BinaryIO] = None,
+                                  emit_pdf: bool = True,
+                                  include_html: bool = False) -> Dict:
         """Generar reporte completo de comparación entre puertos.
-        
+
         Args:
             origen: Nombre del origen de la carga.
             resultado_timbues: Diccionario con resultados para puerto Timbúes.
@@ -322,7 +243,18 @@ class ReportGenerator:
             ruta_lima: Diccionario con datos de ruta a Lima.
             imagenes: Diccionario con imágenes base64 para el reporte.
             analisis_sensibilidad: Lista de diccionarios con análisis de sensibilidad.
-            
+            output: Destino binario opcional (archivo o socket); si se provee,
+                el PDF se escribe directamente ahí y "pdf" vuelve como None,
+                evitando mantener una copia completa en memoria.
+            emit_pdf: Si es False, se omite por completo el render de
+                WeasyPrint (el costo dominante del método) y solo se
+                devuelve el HTML; útil para vistas previas en navegador.
+            include_html: Si es True, incluye el HTML renderizado en la
+                respuesta. Por defecto se omite para que los endpoints que
+                serializan el resultado a JSON no recodifiquen varios KB de
+                HTML que nadie consume. Con emit_pdf=False el HTML se
+                incluye siempre (es el único producto).
+
         Returns:
             Diccionario con reporte PDF en base64 y metadatos.
         """
@@ -336,21 +268,33 @@ class ReportGenerator:
                     "pdf": None
                 }
             
+            # Con un dict vacío como respaldo, los .get() de abajo ya
+            # devuelven None para claves ausentes sin chequeos adicionales.
+            # Se aceptan bytes crudos además de strings base64: la
+            # codificación pasa por el caché por contenido de _b64
+            imagenes = {
+                clave: _b64(bytes(valor)) if isinstance(valor, (bytes, bytearray)) else valor
+                for clave, valor in (imagenes or {}).items()
+            }
+
             # Extraer datos para el reporte
             toneladas = resultado_timbues["toneladas"]
             distancia_timbues = resultado_timbues["distancia_terrestre"]
             distancia_lima = resultado_lima["distancia_terrestre"]
             
-            puerto_optimo = resultados_comparacion["comparacion"]["puerto_optimo"].title()
+            # Conservar la clave canónica junto a la forma de presentación:
+            # el round-trip .title()/.lower() era frágil además de redundante
+            puerto_optimo_key = resultados_comparacion["comparacion"]["puerto_optimo"]
+            puerto_optimo = puerto_optimo_key.title()
             diferencia_absoluta = resultados_comparacion["comparacion"]["diferencia_absoluta"]
             diferencia_porcentual = resultados_comparacion["comparacion"]["diferencia_porcentual"]
             
             # Preparar parámetros del análisis
             parametros = [
                 {"nombre": "Origen", "valor": origen},
-                {"nombre": "Carga (toneladas)", "valor": f"{toneladas:,.2f}"},
-                {"nombre": "Distancia a Timbúes (km)", "valor": f"{distancia_timbues:,.1f}"},
-                {"nombre": "Distancia a Lima (km)", "valor": f"{distancia_lima:,.1f}"}
+                {"nombre": "Carga (toneladas)", "valor": _TON(toneladas)},
+                {"nombre": "Distancia a Timbúes (km)", "valor": _KM(distancia_timbues)},
+                {"nombre": "Distancia a Lima (km)", "valor": _KM(distancia_lima)}
             ]
             
             # Preparar datos de rutas
@@ -358,78 +302,72 @@ class ReportGenerator:
             if ruta_timbues and ruta_timbues["status"] == "success":
                 distancias_rutas.append({
                     "nombre": f"Origen → Timbúes",
-                    "distancia": f"{ruta_timbues['distance']:,.1f}",
-                    "tiempo": f"{ruta_timbues['duration']:,.1f} min"
+                    "distancia": _KM(ruta_timbues['distance']),
+                    "tiempo": f"{_KM(ruta_timbues['duration'])} min"
                 })
                 
             if ruta_lima and ruta_lima["status"] == "success":
                 distancias_rutas.append({
                     "nombre": f"Origen → Lima",
-                    "distancia": f"{ruta_lima['distance']:,.1f}",
-                    "tiempo": f"{ruta_lima['duration']:,.1f} min"
+                    "distancia": _KM(ruta_lima['distance']),
+                    "tiempo": f"{_KM(ruta_lima['duration'])} min"
                 })
                 
             if not distancias_rutas:
                 distancias_rutas = [
                     {
                         "nombre": f"Origen → Timbúes",
-                        "distancia": f"{distancia_timbues:,.1f}",
+                        "distancia": _KM(distancia_timbues),
                         "tiempo": "No disponible"
                     },
                     {
                         "nombre": f"Origen → Lima",
-                        "distancia": f"{distancia_lima:,.1f}",
+                        "distancia": _KM(distancia_lima),
                         "tiempo": "No disponible"
                     }
                 ]
                 
-            # Preparar detalles de costos
-            detalles_costos = [
-                {
-                    "concepto": "Flete Terrestre",
-                    "timbues": f"${resultado_timbues['desglose']['flete_terrestre']:,.2f}",
-                    "lima": f"${resultado_lima['desglose']['flete_terrestre']:,.2f}"
-                },
-                {
-                    "concepto": "Flete Marítimo",
-                    "timbues": f"${resultado_timbues['desglose']['flete_maritimo']:,.2f}",
-                    "lima": f"${resultado_lima['desglose']['flete_maritimo']:,.2f}"
-                },
-                {
-                    "concepto": "Costos Fijos",
-                    "timbues": f"${resultado_timbues['desglose']['costos_fijos']:,.2f}",
-                    "lima": f"${resultado_lima['desglose']['costos_fijos']:,.2f}"
-                }
-            ]
-            
-            # Preparar métricas de conclusiones
+            # Preparar detalles de costos: el formateo monetario se aplica en
+            # una sola pasada de pandas en lugar de f-strings campo por campo
+            # (import diferido: pandas solo se paga si se genera un reporte)
+            import pandas as pd
+
+            desglose_timbues = resultado_timbues["desglose"]
+            desglose_lima = resultado_lima["desglose"]
+            df_costos = pd.DataFrame({
+                "concepto": ["Flete Terrestre", "Flete Marítimo", "Costos Fijos"],
+                "timbues": [desglose_timbues["flete_terrestre"],
+                            desglose_timbues["flete_maritimo"],
+                            desglose_timbues["costos_fijos"]],
+                "lima": [desglose_lima["flete_terrestre"],
+                         desglose_lima["flete_maritimo"],
+                         desglose_lima["costos_fijos"]]
+            })
+            df_costos["timbues"] = df_costos["timbues"].map("${:,.2f}".format)
+            df_costos["lima"] = df_costos["lima"].map("${:,.2f}".format)
+            detalles_costos = df_costos.to_dict("records")
+
+            # Preparar métricas de conclusiones (los montos en USD se
+            # formatean con la misma pasada vectorizada)
+            valores_usd = pd.Series([
+                resultado_timbues["costo_total"],
+                resultado_lima["costo_total"],
+                diferencia_absoluta,
+                resultados_comparacion[puerto_optimo_key]["costo_unitario"]
+            ]).map("${:,.2f}".format)
+
             metricas_conclusiones = [
-                {
-                    "nombre": "Costo Total Puerto Timbúes",
-                    "valor": f"${resultado_timbues['costo_total']:,.2f}"
-                },
-                {
-                    "nombre": "Costo Total Puerto Lima",
-                    "valor": f"${resultado_lima['costo_total']:,.2f}"
-                },
-                {
-                    "nombre": "Ahorro Absoluto",
-                    "valor": f"${diferencia_absoluta:,.2f}"
-                },
-                {
-                    "nombre": "Ahorro Porcentual",
-                    "valor": f"{diferencia_porcentual:.1f}%"
-                },
-                {
-                    "nombre": "Costo Unitario Puerto Óptimo",
-                    "valor": f"${resultados_comparacion[puerto_optimo.lower()]['costo_unitario']:,.2f}/ton"
-                }
+                {"nombre": "Costo Total Puerto Timbúes", "valor": valores_usd[0]},
+                {"nombre": "Costo Total Puerto Lima", "valor": valores_usd[1]},
+                {"nombre": "Ahorro Absoluto", "valor": valores_usd[2]},
+                {"nombre": "Ahorro Porcentual", "valor": _PCT(diferencia_porcentual)},
+                {"nombre": "Costo Unitario Puerto Óptimo", "valor": f"{valores_usd[3]}/ton"}
             ]
             
             # Preparar recomendaciones
             recomendaciones = [
                 f"Utilizar el puerto de {puerto_optimo} para esta operación de exportación.",
-                f"El ahorro estimado es de ${diferencia_absoluta:,.2f} en comparación con la alternativa."
+                f"El ahorro estimado es de {_USD(diferencia_absoluta)} en comparación con la alternativa."
             ]
             
             # Verificar si la diferencia es significativa
@@ -437,19 +375,20 @@ class ReportGenerator:
                 recomendaciones.append("La diferencia de costos es menor al 5%. "
                                      "Considerar otros factores logísticos o comerciales para la decisión final.")
             
-            # Preparar resumen ejecutivo
-            resumen_ejecutivo = f"""
-            Este informe presenta un análisis comparativo de costos y rutas de exportación 
-            desde {origen} utilizando dos puertos alternativos: Timbúes (Argentina) y Lima (Perú).
-            
-            El análisis se basa en una carga de {toneladas:,.2f} toneladas, con distancias terrestres 
-            de {distancia_timbues:,.1f} km a Timbúes y {distancia_lima:,.1f} km a Lima.
-            
-            La conclusión principal es que el puerto de {puerto_optimo} representa la opción más 
-            económica, con un ahorro estimado de ${diferencia_absoluta:,.2f} ({diferencia_porcentual:.1f}%) 
-            en comparación con la alternativa.
-            """
-            
+            # Resumen ejecutivo: el texto vive en la plantilla (donde se
+            # compila una sola vez); acá solo se pasan los valores ya
+            # formateados que intercala
+            resumen = {
+                "origen": origen,
+                "toneladas": _TON(toneladas),
+                "distancia_timbues": _KM(distancia_timbues),
+                "distancia_lima": _KM(distancia_lima),
+                "puerto_optimo": puerto_optimo,
+                "ahorro": _USD(diferencia_absoluta),
+                "ahorro_porcentual": _PCT(diferencia_porcentual)
+            }
+
+
             # Preparar análisis de sensibilidad si existe
             datos_sensibilidad = None
             if analisis_sensibilidad:
@@ -462,21 +401,30 @@ class ReportGenerator:
             template_data = {
                 "titulo": f"Análisis de Exportación: {origen}",
                 "fecha": self.today,
-                "resumen_ejecutivo": resumen_ejecutivo,
+                "resumen": resumen,
                 "parametros": parametros,
                 "analisis_rutas": {
                     "descripcion": "Análisis de las distancias y tiempos estimados para cada ruta alternativa.",
                     "distancias": distancias_rutas,
-                    "mapa": imagenes.get("mapa_html") if imagenes and "mapa_html" in imagenes else None
+                    "mapa": imagenes.get("mapa_html")
                 },
                 "analisis_costos": {
                     "descripcion": "Desglose y comparación de costos para cada alternativa de exportación.",
                     "detalles": detalles_costos,
-                    "total_timbues": f"${resultado_timbues['costo_total']:,.2f}",
-                    "total_lima": f"${resultado_lima['costo_total']:,.2f}",
-                    "imagen_comparacion": imagenes.get("comparacion") if imagenes and "comparacion" in imagenes else None,
-                    "imagen_desglose_timbues": imagenes.get("desglose_timbues") if imagenes and "desglose_timbues" in imagenes else None,
-                    "imagen_desglose_lima": imagenes.get("desglose_lima") if imagenes and "desglose_lima" in imagenes else None
+                    "total_timbues": _USD(resultado_timbues['costo_total']),
+                    "total_lima": _USD(resultado_lima['costo_total']),
+                    # Lista filtrada que la plantilla recorre con un único
+                    # {% for %}: un solo bloque compilado en lugar de tres
+                    # {% if %} con su markup duplicado
+                    "imagenes": [
+                        {"titulo": titulo, "b64": b64}
+                        for titulo, b64 in [
+                            ("Comparación Gráfica de Costos", imagenes.get("comparacion")),
+                            ("Desglose de Costos - Timbúes", imagenes.get("desglose_timbues")),
+                            ("Desglose de Costos - Lima", imagenes.get("desglose_lima"))
+                        ]
+                        if b64
+                    ]
                 },
                 "conclusiones": {
                     "puerto_optimo": puerto_optimo,
@@ -489,23 +437,46 @@ class ReportGenerator:
                 "analisis_sensibilidad": datos_sensibilidad
             }
             
-            # Renderizar plantilla
-            template = Template(self.report_template)
-            html_content = template.render(**template_data)
-            
-            # Convertir a PDF
-            pdf_file = io.BytesIO()
-            HTML(string=html_content).write_pdf(pdf_file)
-            pdf_file.seek(0)
+            # Renderizar plantilla (ya compilada en __init__)
+            html_content = self._compiled_template.render(**template_data)
             
-            return {
+            # Convertir a PDF (solo si se pidió: write_pdf es por lejos el
+            # costo dominante del método). Con un destino explícito se
+            # escribe en streaming sin duplicar los bytes en memoria
+            pdf_bytes = None
+            if emit_pdf:
+                html_cls, css_obj, font_config = _get_weasyprint()
+                if output is not None:
+                    html_cls(string=html_content, url_fetcher=_no_net).write_pdf(
+                        output, stylesheets=[css_obj], font_config=font_config)
+                else:
+                    # write_pdf sin destino ya devuelve los bytes, sin pasar
+                    # por un BytesIO intermedio más getvalue()
+                    pdf_bytes = html_cls(string=html_content, url_fetcher=_no_net).write_pdf(
+                        stylesheets=[css_obj], font_config=font_config)
+
+            resultado = {
                 "status": "success",
-                "pdf": pdf_file.getvalue(),
-                "html": html_content,
+                "pdf": pdf_bytes,
                 "puerto_optimo": puerto_optimo,
                 "ahorro": diferencia_absoluta,
                 "ahorro_porcentual": diferencia_porcentual
             }
+
+            # El HTML es opt-in: serializarlo a JSON en cada respuesta
+            # cuesta codificación UTF-8 + escaneo de escapes para nada si
+            # el cliente solo usa el PDF. Cuando sí se devuelve, se
+            # reinyecta la hoja de estilos inline: el objeto CSS parseado
+            # solo aplica al render de WeasyPrint y un navegador recibiría
+            # el documento sin estilos
+            if include_html or not emit_pdf:
+                resultado["html"] = html_content.replace(
+                    "</head>",
+                    f"<style>\n{REPORT_CSS}</style>\n</head>",
+                    1
+                )
+
+            return resultado
             
         except Exception as e:
             logger.error(f"Error al generar reporte de comparación: {str(e)}")
@@ -513,4 +484,45 @@ class ReportGenerator:
                 "status": "error",
                 "message": f"Error al generar reporte de comparación: {str(e)}",
                 "pdf": None
-            }
\ No newline at end of file
+            }
+
+    @classmethod
+    def generate_batch(cls, jobs: List[Dict]) -> List[Dict]:
+        """Generar varios reportes en paralelo, uno por proceso.
+
+        WeasyPrint es monohilo y está limitado por CPU, pero documentos
+        distintos son independientes: repartirlos entre procesos escala
+        casi linealmente con los núcleos disponibles.
+
+        Args:
+            jobs: Lista de diccionarios con los argumentos (por nombre) de
+                `generar_reporte_comparacion`.
+
+        Returns:
+            Lista de resultados en el mismo orden que `jobs`.
+        """
+        resultados: List[Optional[Dict]] = [None] * len(jobs)
+
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            futuros = {pool.submit(_render_one, job): i for i, job in enumerate(jobs)}
+            for futuro in as_completed(futuros):
+                resultados[futuros[futuro]] = futuro.result()
+
+        return resultados
+
+    def generar_reporte_html(self, *args, **kwargs) -> Dict:
+        """Generar solo el HTML del reporte, sin renderizar el PDF.
+
+        Acepta los mismos argumentos que `generar_reporte_comparacion`;
+        pensado para endpoints de vista previa donde el PDF no se usa.
+
+        Returns:
+            Diccionario con el reporte en HTML y metadatos ("pdf" es None).
+        """
+        kwargs["emit_pdf"] = False
+        return self.generar_reporte_comparacion(*args, **kwargs)
+
+
+def _render_one(job: Dict) -> Dict:
+    """Renderizar un reporte en un proceso worker (función picklable)."""
+    return ReportGenerator().generar_reporte_comparacion(**job)
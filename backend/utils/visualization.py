@@ -6,14 +6,32 @@ para representar las rutas y costos de exportación.
 """
 
 import io
+import os
+import copy
 import base64
 import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-import folium
-from folium.features import DivIcon
+# matplotlib y folium se importan de forma diferida: cuestan cientos de
+# milisegundos y decenas de MB por worker, y un request que solo pide
+# resultados numéricos nunca los necesita. Los módulos se cargan la
+# primera vez que se genera un gráfico o un mapa.
+matplotlib = None
+plt = None
+Figure = None
+FigureCanvasAgg = None
+folium = None
+DivIcon = None
+from shapely.geometry import LineString
+
+# Pillow es opcional: si está instalado se usa para codificar el PNG
+# directamente desde el buffer RGBA del canvas Agg
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 from typing import Dict, List, Tuple, Optional, Union
 from config.default import (
     COORDENADAS_TIMBUES,
@@ -25,6 +43,434 @@ from config.default import (
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Formateador de montos precomputado: cada f-string con spec ',.2f'
+# reparsea el formato; el bound method lo parsea una sola vez y se puede
+# mapear sobre listas largas de etiquetas
+_FMT_USD = "${:,.2f}".format
+
+
+def _importar_matplotlib() -> None:
+    """Cargar matplotlib (backend Agg) la primera vez que se lo necesita.
+
+    El backend Agg (sin GUI) se fija antes de importar pyplot para evitar
+    la autodetección de backend interactivo y sus dependencias de display.
+    """
+    global matplotlib, plt, Figure, FigureCanvasAgg
+    if matplotlib is None:
+        import matplotlib as _matplotlib
+        _matplotlib.use("Agg")
+        import matplotlib.pyplot as _plt
+        from matplotlib.figure import Figure as _Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg as _FigureCanvasAgg
+        matplotlib = _matplotlib
+        plt = _plt
+        Figure = _Figure
+        FigureCanvasAgg = _FigureCanvasAgg
+
+
+def _importar_folium() -> None:
+    """Cargar folium la primera vez que se genera un mapa."""
+    global folium, DivIcon
+    if folium is None:
+        import folium as _folium
+        from folium.features import DivIcon as _DivIcon
+        folium = _folium
+        DivIcon = _DivIcon
+
+
+# Figura reutilizable por hilo: crear y destruir una Figure por request
+# paga construcción de canvas y lookups del font-manager cada vez; con
+# clear() + redibujo el PNG resultante es idéntico sin esas asignaciones
+_FIG_LOCAL = threading.local()
+
+
+def _get_fig(figsize: Tuple[float, float]) -> "Figure":
+    """Obtener la figura Agg reutilizable del hilo actual, ya limpia."""
+    _importar_matplotlib()
+    fig = getattr(_FIG_LOCAL, "fig", None)
+    if fig is None:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        _FIG_LOCAL.fig = fig
+    else:
+        fig.clear()
+        fig.set_size_inches(*figsize)
+    return fig
+
+# Pool de procesos para el render (opt-in): la rasterización de
+# matplotlib es CPU-bound y retiene el GIL, así que bajo tráfico
+# concurrente conviene despacharla a subprocesos. Los renders son
+# funciones puras de módulo con argumentos escalares, o sea picklables.
+_RENDER_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def _init_render_worker() -> None:
+    """Cargar matplotlib con backend Agg en los procesos del pool de render."""
+    _importar_matplotlib()
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    """Crear (una sola vez) y devolver el pool de procesos de render."""
+    global _RENDER_POOL
+    if _RENDER_POOL is None:
+        _RENDER_POOL = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            initializer=_init_render_worker
+        )
+    return _RENDER_POOL
+
+
+def _exportar_figura(fig: "Figure", formato: str = "png", dpi: int = 100,
+                     binary: bool = False,
+                     fast_png: bool = False) -> Union[str, bytes]:
+    """Serializar la figura al formato pedido.
+
+    PNG se devuelve en base64 (contrato actual de la API); SVG se
+    devuelve como texto plano listo para incrustar en HTML, lo que evita
+    la compresión zlib de libpng y el paso por base64 — para gráficos de
+    líneas/barras el SVG resultante es mucho más chico que el raster.
+    Con binary=True se devuelven los bytes crudos (sin base64, que
+    infla el payload un 33% y cuesta una pasada completa extra), pensados
+    para responder directo con Content-Type de imagen.
+
+    fast_png=True codifica el buffer RGBA del canvas Agg con Pillow a
+    zlib nivel 1, salteando el recómputo de bbox de savefig. Al no haber
+    recorte 'tight', solo sirve para figuras cuyo contenido completo cabe
+    en el lienzo fijo: las leyendas ancladas fuera de los ejes (como la de
+    los gráficos de sensibilidad) quedarían cortadas, así que por defecto
+    se usa savefig con bbox_inches='tight'.
+    """
+    with io.BytesIO() as buf:
+        if formato == "svg":
+            fig.savefig(buf, format='svg', bbox_inches='tight')
+            if binary:
+                return buf.getvalue()
+            return buf.getvalue().decode('utf-8')
+        if fast_png and Image is not None:
+            fig.set_dpi(dpi)
+            canvas = fig.canvas
+            canvas.draw()
+            w, h = canvas.get_width_height()
+            Image.frombuffer('RGBA', (w, h), canvas.buffer_rgba(),
+                             'raw', 'RGBA', 0, 1).save(buf, 'PNG',
+                                                       compress_level=1)
+        else:
+            # getbuffer() expone los bytes del PNG sin copiarlos
+            # (getvalue() duplica el pico de memoria en figuras grandes)
+            fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+        if binary:
+            return bytes(buf.getbuffer())
+        return base64.b64encode(buf.getbuffer()).decode('ascii')
+
+
+# ----------------------------------------------------------------------
+# Renders puros cacheados por contenido: la UI pide el mismo gráfico una
+# y otra vez al alternar vistas, y un hit devuelve el base64 ya codificado
+# sin tocar matplotlib. Las claves son exactamente los valores numéricos
+# (y colores) que determinan la imagen.
+# ----------------------------------------------------------------------
+
+@lru_cache(maxsize=256)
+def _render_comparacion_png(ft_t: float, fm_t: float, cf_t: float,
+                            ft_l: float, fm_l: float, cf_l: float,
+                            total_timbues: float, total_lima: float,
+                            puerto_optimo: str, diferencia: float,
+                            diferencia_porcentual: float,
+                            colores: Tuple[str, str],
+                            formato: str = "png", dpi: int = 100,
+                            binary: bool = False) -> Union[str, bytes]:
+    """Renderizar el gráfico de comparación de costos y devolver base64."""
+    categorias = ["Flete Terrestre", "Flete Marítimo", "Costos Fijos"]
+    # Listas planas: armar un DataFrame para seis floats paga índices y
+    # BlockManager de pandas sin aportar nada al gráfico
+    timbues_vals = [ft_t, fm_t, cf_t]
+    lima_vals = [ft_l, fm_l, cf_l]
+
+    # Configurar figura (reutilizada por hilo)
+    fig = _get_fig((10, 6))
+    ax = fig.add_subplot(111)
+
+    # Crear gráfico de barras agrupadas
+    ancho = 0.35
+    indice = np.arange(len(categorias))
+
+    # Barras para cada puerto
+    barra_timbues = ax.bar(indice - ancho/2, timbues_vals, ancho,
+                           label=f'Timbúes (Total: {_FMT_USD(total_timbues)})',
+                           color=colores[0])
+
+    barra_lima = ax.bar(indice + ancho/2, lima_vals, ancho,
+                        label=f'Lima (Total: {_FMT_USD(total_lima)})',
+                        color=colores[1])
+
+    # Añadir etiquetas y leyenda
+    ax.set_title('Comparación de Costos por Puerto', fontsize=16)
+    ax.set_ylabel('Costo (USD)', fontsize=12)
+    ax.set_xticks(indice)
+    ax.set_xticklabels(categorias, fontsize=10)
+
+    # Añadir valores en las barras: bar_label etiqueta el contenedor
+    # completo en una pasada (propiedades de texto y transforms
+    # compartidos) en lugar de un ax.text por barra
+    ax.bar_label(barra_timbues, labels=[_FMT_USD(v) for v in timbues_vals],
+                 padding=3, fontsize=9)
+    ax.bar_label(barra_lima, labels=[_FMT_USD(v) for v in lima_vals],
+                 padding=3, fontsize=9)
+
+    resumen = f"""Puerto óptimo: {puerto_optimo.title()}
+Ahorro: {_FMT_USD(diferencia)} ({diferencia_porcentual:.1f}%)"""
+
+    # Posicionar el texto de resumen
+    fig.text(0.15, 0.02, resumen, fontsize=10,
+             bbox=dict(facecolor='lightgray', alpha=0.5))
+
+    # Mostrar leyenda
+    ax.legend(loc='upper right')
+
+    # Mejorar estética
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # Guardar gráfico en memoria
+    return _exportar_figura(fig, formato, dpi, binary)
+
+
+@lru_cache(maxsize=256)
+def _render_desglose_png(ft: float, fm: float, cf: float,
+                         puerto: str, titulo: Optional[str],
+                         distancia_terrestre: float, toneladas: float,
+                         costo_total: float, costo_unitario: float,
+                         colores: Tuple[str, str, str],
+                         formato: str = "png", dpi: int = 100,
+                         binary: bool = False) -> Union[str, bytes]:
+    """Renderizar el gráfico de desglose de costos y devolver base64."""
+    categorias = ["Flete Terrestre", "Flete Marítimo", "Costos Fijos"]
+    valores = [ft, fm, cf]
+
+    # Crear figura (reutilizada por hilo)
+    fig = _get_fig((12, 6))
+    ax1 = fig.add_subplot(121)
+    ax2 = fig.add_subplot(122)
+    fig.subplots_adjust(wspace=0.3)
+
+    # Gráfico de torta
+    wedges, texts, autotexts = ax1.pie(
+        valores,
+        autopct='%1.1f%%',
+        textprops={'fontsize': 9},
+        colors=colores,
+        startangle=90,
+        shadow=False
+    )
+
+    # Mejorar el aspecto visual
+    plt.setp(autotexts, size=8, weight="bold")
+
+    # Añadir leyenda
+    ax1.legend(
+        wedges,
+        [f"{cat} ({_FMT_USD(val)})" for cat, val in zip(categorias, valores)],
+        loc="center left",
+        bbox_to_anchor=(0.95, 0.5),
+        fontsize=9
+    )
+
+    # Gráfico de barras horizontal
+    y_pos = np.arange(len(categorias))
+    barras_h = ax2.barh(y_pos, valores, align='center', color=colores)
+    ax2.set_yticks(y_pos)
+    ax2.set_yticklabels(categorias)
+    ax2.invert_yaxis()  # Los valores más altos están abajo
+
+    # Añadir valores en las barras (una pasada de bar_label)
+    ax2.bar_label(barras_h, labels=[_FMT_USD(v) for v in valores],
+                  padding=3, fontsize=9)
+
+    # Configurar título y etiquetas
+    if not titulo:
+        titulo = f"Desglose de Costos - Puerto {puerto}"
+
+    fig.suptitle(titulo, fontsize=14)
+    ax1.set_title("Proporción de Costos", fontsize=11)
+    ax2.set_title("Montos por Categoría", fontsize=11)
+    ax2.set_xlabel("Costo (USD)", fontsize=10)
+
+    # Añadir texto con información adicional
+    info_texto = f"""
+Puerto: {puerto}
+Distancia: {distancia_terrestre:.0f} km
+Carga: {toneladas:.1f} toneladas
+Costo Total: {_FMT_USD(costo_total)}
+Costo Unitario: {_FMT_USD(costo_unitario)}/ton
+            """
+
+    # Posicionar el texto de información
+    fig.text(0.01, 0.02, info_texto, fontsize=9,
+             bbox=dict(facecolor='lightgray', alpha=0.5))
+
+    # Eliminar bordes de los gráficos
+    ax2.spines['top'].set_visible(False)
+    ax2.spines['right'].set_visible(False)
+
+    # Guardar gráfico en memoria
+    return _exportar_figura(fig, formato, dpi, binary)
+
+
+@lru_cache(maxsize=256)
+def _render_sensibilidad_png(valores_parametro: Tuple[float, ...],
+                             costos_timbues: Tuple[float, ...],
+                             costos_lima: Tuple[float, ...],
+                             nombre_parametro: str,
+                             unidad_parametro: str,
+                             colores: Tuple[str, str],
+                             formato: str = "png",
+                             dpi: int = 100,
+                             binary: bool = False) -> Tuple[Union[str, bytes], Optional[float], Optional[float]]:
+    """Renderizar el gráfico de sensibilidad.
+
+    Returns:
+        Tupla (imagen base64, punto de equilibrio, costo de equilibrio).
+    """
+    # Crear figura (reutilizada por hilo)
+    fig = _get_fig((10, 6))
+    ax = fig.add_subplot(111)
+
+    # Trazar líneas para cada puerto
+    ax.plot(valores_parametro, costos_timbues, 'o-',
+            color=colores[0],
+            linewidth=2,
+            markersize=6,
+            label="Puerto Timbúes")
+
+    ax.plot(valores_parametro, costos_lima, 's-',
+            color=colores[1],
+            linewidth=2,
+            markersize=6,
+            label="Puerto Lima")
+
+    # Calcular punto de cruce (si existe): el cambio de signo de la
+    # diferencia de costos se detecta en una sola pasada vectorizada en
+    # lugar de comparar intervalo por intervalo en Python
+    punto_cruce_x = None
+    punto_cruce_y = None
+
+    vp = np.asarray(valores_parametro, dtype=np.float64)
+    ct = np.asarray(costos_timbues, dtype=np.float64)
+    diff = ct - np.asarray(costos_lima, dtype=np.float64)
+    cambios = np.where(np.diff(np.sign(diff)) != 0)[0]
+
+    if cambios.size:
+        i = int(cambios[0])
+        # Intersección lineal cerrada dentro del intervalo que cruza
+        x1, x2 = vp[i], vp[i + 1]
+        punto_cruce_x = float(x1 + (x2 - x1) * diff[i] / (diff[i] - diff[i + 1]))
+        m_t = (ct[i + 1] - ct[i]) / (x2 - x1)
+        punto_cruce_y = float(ct[i] + m_t * (punto_cruce_x - x1))
+
+        # Marcar el punto de cruce
+        ax.plot(punto_cruce_x, punto_cruce_y, 'X',
+                color='green', markersize=10,
+                label=f"Punto de equilibrio: {punto_cruce_x:.1f} {unidad_parametro}")
+
+        # Línea vertical en el punto de cruce
+        ax.axvline(x=punto_cruce_x, color='green', linestyle='--', alpha=0.5)
+
+    # Regiones de colores para indicar puerto más conveniente
+    if punto_cruce_x:
+        min_x = min(valores_parametro)
+        max_x = max(valores_parametro)
+        max_y = max(max(costos_timbues), max(costos_lima)) * 1.1
+
+        # Determinar qué puerto es mejor en cada región
+        if costos_timbues[0] < costos_lima[0]:
+            # Timbúes es mejor para valores bajos del parámetro
+            ax.fill_between([min_x, punto_cruce_x], 0, max_y,
+                            color=colores[0], alpha=0.1)
+            ax.fill_between([punto_cruce_x, max_x], 0, max_y,
+                            color=colores[1], alpha=0.1)
+        else:
+            # Lima es mejor para valores bajos del parámetro
+            ax.fill_between([min_x, punto_cruce_x], 0, max_y,
+                            color=colores[1], alpha=0.1)
+            ax.fill_between([punto_cruce_x, max_x], 0, max_y,
+                            color=colores[0], alpha=0.1)
+
+    # Configurar etiquetas y título
+    ax.set_title(f'Análisis de Sensibilidad - {nombre_parametro}', fontsize=14)
+    ax.set_xlabel(f'{nombre_parametro} ({unidad_parametro})', fontsize=12)
+    ax.set_ylabel('Costo Total (USD)', fontsize=12)
+
+    # Mejorar estética
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+
+    # Colocar leyenda
+    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=3, fontsize=10)
+
+    # Añadir anotación de punto de cruce
+    if punto_cruce_x:
+        ax.annotate(
+            f'Punto de equilibrio:\n{punto_cruce_x:.1f} {unidad_parametro}, ${punto_cruce_y:.2f}',
+            xy=(punto_cruce_x, punto_cruce_y),
+            xytext=(punto_cruce_x + (max_x - min_x)*0.1, punto_cruce_y + (max_y*0.1)),
+            arrowprops=dict(arrowstyle="->", color="black", lw=1.5),
+            fontsize=9,
+            bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="gray", alpha=0.8)
+        )
+
+    # Guardar gráfico en memoria
+    imagen = _exportar_figura(fig, formato, dpi, binary)
+
+    return imagen, punto_cruce_x, punto_cruce_y
+
+
+# Título estático del mapa de rutas (igual en todas las requests)
+_TITULO_MAPA_HTML = '''
+<div style="position: fixed;
+            top: 10px; left: 50px; width: 300px; height: 90px;
+            background-color: white; border-radius: 5px;
+            z-index: 900; font-size: 14px; padding: 10px">
+    <h4 style="margin-top: 0;">Rutas de Exportación</h4>
+    <p>Comparación de rutas desde el origen hacia puertos alternativos</p>
+</div>
+'''
+
+# Mapa base construido una sola vez: registrar las tiles de CartoDB y
+# armar el árbol Jinja del título en cada request es la parte cara de
+# crear un folium.Map; una copia del precomputado se la saltea
+_BASE_MAP: Optional["folium.Map"] = None
+
+
+def _get_base_map() -> "folium.Map":
+    """Devolver una copia independiente del mapa base precomputado."""
+    global _BASE_MAP
+    if _BASE_MAP is None:
+        _importar_folium()
+        base = folium.Map(
+            location=[-20, -65],  # Centrado aproximado en Sudamérica
+            zoom_start=4,
+            tiles='CartoDB positron'
+        )
+        base.get_root().html.add_child(folium.Element(_TITULO_MAPA_HTML))
+        _BASE_MAP = base
+    return copy.deepcopy(_BASE_MAP)
+
+
+def _simplificar_ruta(ruta_coords: List, tolerancia: float = 0.001) -> List[Tuple[float, float]]:
+    """Simplificar la geometría de una ruta antes de dibujarla en folium.
+
+    Las rutas terrestres largas traen cientos de puntos que folium
+    serializa uno por uno al HTML del mapa; Douglas-Peucker (vía shapely)
+    descarta los colineales y el redondeo a 5 decimales (~1 m) acorta el
+    JSON sin pérdida visible.
+    """
+    if len(ruta_coords) > 2:
+        ruta_coords = LineString(ruta_coords).simplify(tolerancia).coords
+    return [(round(lat, 5), round(lng, 5)) for lat, lng in ruta_coords]
+
+
 class VisualizationGenerator:
     """Clase para generar visualizaciones de rutas y costos."""
     
@@ -32,7 +478,8 @@ class VisualizationGenerator:
                 coords_timbues: Tuple[float, float] = COORDENADAS_TIMBUES,
                 coords_lima: Tuple[float, float] = COORDENADAS_LIMA,
                 colores_primarios: List[str] = VISUALIZACION_COLORES_PRIMARIOS,
-                colores_secundarios: List[str] = VISUALIZACION_COLORES_SECUNDARIOS):
+                colores_secundarios: List[str] = VISUALIZACION_COLORES_SECUNDARIOS,
+                render_en_pool: bool = False):
         """Inicializar generador de visualizaciones.
         
         Args:
@@ -40,21 +487,42 @@ class VisualizationGenerator:
             coords_lima: Coordenadas (longitud, latitud) de puerto Lima.
             colores_primarios: Lista de colores primarios para gráficos.
             colores_secundarios: Lista de colores secundarios para gráficos.
+            render_en_pool: Si es True, los gráficos se renderizan en un
+                pool de procesos para no bloquear el hilo del request.
         """
         self.coords_timbues = coords_timbues
         self.coords_lima = coords_lima
-        self.colores_primarios = colores_primarios
-        self.colores_secundarios = colores_secundarios
+        # Tuplas inmutables: los prefijos que usan los gráficos quedan
+        # precomputados (y hashables para la caché de renders) en vez de
+        # rebanarse y convertirse en cada llamada
+        self.colores_primarios = tuple(colores_primarios)
+        self.colores_secundarios = tuple(colores_secundarios)
+        self._primary2 = self.colores_primarios[:2]
+        self._primary3 = self.colores_primarios[:3]
+        self.render_en_pool = render_en_pool
+
+    def _render(self, fn, *args):
+        """Ejecutar un render puro, en el pool de procesos si está habilitado."""
+        if self.render_en_pool:
+            return _get_render_pool().submit(fn, *args).result()
+        return fn(*args)
     
     def generar_grafico_comparacion_costos(self, 
-                                         resultados_comparacion: Dict) -> Dict:
+                                         resultados_comparacion: Dict,
+                                         formato: str = "png",
+                                         dpi: int = 100,
+                                         binary: bool = False) -> Dict:
         """Generar gráfico de barras comparando costos entre puertos.
         
         Args:
             resultados_comparacion: Diccionario con resultados de comparación de costos.
+            formato: Formato de salida ('png' en base64 o 'svg' como texto).
+            dpi: Resolución del PNG (ej. 72 para vistas previas).
+            binary: Si es True, devuelve los bytes crudos de la imagen
+                bajo la clave 'imagen_bytes' en lugar de base64.
             
         Returns:
-            Diccionario con imagen base64 del gráfico y metadatos.
+            Diccionario con imagen del gráfico y metadatos.
         """
         try:
             if resultados_comparacion["status"] != "success":
@@ -63,100 +531,50 @@ class VisualizationGenerator:
                     "message": "Los resultados de comparación no son válidos",
                     "imagen": None
                 }
-            
-            # Extraer datos relevantes
+
+            # Desempaquetar una sola vez: cada acceso anidado repetido es
+            # un hash-lookup extra y los locales resuelven por LOAD_FAST
             timbues = resultados_comparacion["timbues"]
             lima = resultados_comparacion["lima"]
-            
-            # Crear DataFrame para visualización
-            categorias = ["Flete Terrestre", "Flete Marítimo", "Costos Fijos"]
-            
-            datos = pd.DataFrame({
-                "Timbúes": [
-                    timbues["desglose"]["flete_terrestre"],
-                    timbues["desglose"]["flete_maritimo"],
-                    timbues["desglose"]["costos_fijos"]
-                ],
-                "Lima": [
-                    lima["desglose"]["flete_terrestre"],
-                    lima["desglose"]["flete_maritimo"],
-                    lima["desglose"]["costos_fijos"]
-                ]
-            }, index=categorias)
-            
-            # Calcular totales
-            total_timbues = timbues["costo_total"]
-            total_lima = lima["costo_total"]
-            
-            # Configurar figura
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            # Crear gráfico de barras agrupadas
-            ancho = 0.35
-            indice = np.arange(len(categorias))
-            
-            # Barras para cada puerto
-            barra_timbues = ax.bar(indice - ancho/2, datos["Timbúes"], ancho, 
-                                  label=f'Timbúes (Total: ${total_timbues:,.2f})', 
-                                  color=self.colores_primarios[0])
-            
-            barra_lima = ax.bar(indice + ancho/2, datos["Lima"], ancho, 
-                              label=f'Lima (Total: ${total_lima:,.2f})', 
-                              color=self.colores_primarios[1])
-            
-            # Añadir etiquetas y leyenda
-            ax.set_title('Comparación de Costos por Puerto', fontsize=16)
-            ax.set_ylabel('Costo (USD)', fontsize=12)
-            ax.set_xticks(indice)
-            ax.set_xticklabels(categorias, fontsize=10)
-            
-            # Añadir valores en las barras
-            def agregar_etiquetas(barras):
-                for barra in barras:
-                    altura = barra.get_height()
-                    ax.text(barra.get_x() + barra.get_width()/2., altura + 0.1,
-                           f'${altura:,.2f}', ha='center', va='bottom', 
-                           fontsize=9, rotation=0)
-            
-            agregar_etiquetas(barra_timbues)
-            agregar_etiquetas(barra_lima)
-            
-            # Añadir texto con análisis de diferencia
-            puerto_optimo = resultados_comparacion["comparacion"]["puerto_optimo"]
-            diferencia = resultados_comparacion["comparacion"]["diferencia_absoluta"]
-            diferencia_porcentual = resultados_comparacion["comparacion"]["diferencia_porcentual"]
-            
-            resumen = f"""Puerto óptimo: {puerto_optimo.title()}
-Ahorro: ${diferencia:,.2f} ({diferencia_porcentual:.1f}%)"""
-            
-            # Posicionar el texto de resumen
-            plt.figtext(0.15, 0.02, resumen, fontsize=10, 
-                      bbox=dict(facecolor='lightgray', alpha=0.5))
-            
-            # Mostrar leyenda
-            ax.legend(loc='upper right')
-            
-            # Mejorar estética
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            ax.grid(axis='y', linestyle='--', alpha=0.7)
-            
-            # Guardar gráfico en memoria como imagen base64
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-            imagen_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-            plt.close(fig)
-            
+            desglose_timbues = timbues["desglose"]
+            desglose_lima = lima["desglose"]
+            comparacion = resultados_comparacion["comparacion"]
+
+            puerto_optimo = comparacion["puerto_optimo"]
+            diferencia = comparacion["diferencia_absoluta"]
+            diferencia_porcentual = comparacion["diferencia_porcentual"]
+
+            # El render cacheado se saltea matplotlib por completo cuando
+            # los mismos números ya se graficaron (la UI repite el pedido
+            # al alternar vistas)
+            imagen_base64 = self._render(
+                _render_comparacion_png,
+                desglose_timbues["flete_terrestre"],
+                desglose_timbues["flete_maritimo"],
+                desglose_timbues["costos_fijos"],
+                desglose_lima["flete_terrestre"],
+                desglose_lima["flete_maritimo"],
+                desglose_lima["costos_fijos"],
+                timbues["costo_total"],
+                lima["costo_total"],
+                puerto_optimo,
+                diferencia,
+                diferencia_porcentual,
+                self._primary2,
+                formato,
+                dpi,
+                binary
+            )
+
             return {
                 "status": "success",
-                "imagen": imagen_base64,
-                "formato": "png",
+                ("imagen_bytes" if binary else "imagen"): imagen_base64,
+                "formato": formato,
                 "puerto_optimo": puerto_optimo,
                 "diferencia_absoluta": diferencia,
                 "diferencia_porcentual": diferencia_porcentual
             }
-            
+
         except Exception as e:
             logger.error(f"Error al generar gráfico de comparación: {str(e)}")
             return {
@@ -167,15 +585,22 @@ Ahorro: ${diferencia:,.2f} ({diferencia_porcentual:.1f}%)"""
     
     def generar_grafico_desglose_costos(self, 
                                       resultado_puerto: Dict,
-                                      titulo: Optional[str] = None) -> Dict:
+                                      titulo: Optional[str] = None,
+                                      formato: str = "png",
+                                      dpi: int = 100,
+                                      binary: bool = False) -> Dict:
         """Generar gráfico circular de desglose de costos para un puerto.
         
         Args:
             resultado_puerto: Diccionario con resultados de cálculo de costos.
             titulo: Título personalizado para el gráfico.
+            formato: Formato de salida ('png' en base64 o 'svg' como texto).
+            dpi: Resolución del PNG (ej. 72 para vistas previas).
+            binary: Si es True, devuelve los bytes crudos de la imagen
+                bajo la clave 'imagen_bytes' en lugar de base64.
             
         Returns:
-            Diccionario con imagen base64 del gráfico y metadatos.
+            Diccionario con imagen del gráfico y metadatos.
         """
         try:
             if resultado_puerto["status"] != "success":
@@ -184,98 +609,40 @@ Ahorro: ${diferencia:,.2f} ({diferencia_porcentual:.1f}%)"""
                     "message": "Los resultados del puerto no son válidos",
                     "imagen": None
                 }
-            
-            # Extraer datos relevantes
+
+            # Desempaquetar una sola vez (mismo criterio que en el
+            # gráfico de comparación)
             desglose = resultado_puerto["desglose"]
             puerto = resultado_puerto["puerto"].title()
-            
-            # Preparar datos para el gráfico
-            categorias = ["Flete Terrestre", "Flete Marítimo", "Costos Fijos"]
-            valores = [
+            costo_total = resultado_puerto["costo_total"]
+            costo_unitario = resultado_puerto["costo_unitario"]
+
+            imagen_base64 = self._render(
+                _render_desglose_png,
                 desglose["flete_terrestre"],
                 desglose["flete_maritimo"],
-                desglose["costos_fijos"]
-            ]
-            
-            # Crear figura
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
-            fig.subplots_adjust(wspace=0.3)
-            
-            # Gráfico de torta
-            wedges, texts, autotexts = ax1.pie(
-                valores, 
-                autopct='%1.1f%%',
-                textprops={'fontsize': 9},
-                colors=self.colores_primarios[:3],
-                startangle=90,
-                shadow=False
-            )
-            
-            # Mejorar el aspecto visual
-            plt.setp(autotexts, size=8, weight="bold")
-            
-            # Añadir leyenda
-            ax1.legend(
-                wedges, 
-                [f"{cat} (${val:,.2f})" for cat, val in zip(categorias, valores)],
-                loc="center left",
-                bbox_to_anchor=(0.95, 0.5),
-                fontsize=9
+                desglose["costos_fijos"],
+                puerto,
+                titulo,
+                resultado_puerto["distancia_terrestre"],
+                resultado_puerto["toneladas"],
+                costo_total,
+                costo_unitario,
+                self._primary3,
+                formato,
+                dpi,
+                binary
             )
-            
-            # Gráfico de barras horizontal
-            y_pos = np.arange(len(categorias))
-            ax2.barh(y_pos, valores, align='center', color=self.colores_primarios[:3])
-            ax2.set_yticks(y_pos)
-            ax2.set_yticklabels(categorias)
-            ax2.invert_yaxis()  # Los valores más altos están abajo
-            
-            # Añadir valores en las barras
-            for i, v in enumerate(valores):
-                ax2.text(v + v*0.01, i, f"${v:,.2f}", va='center', fontsize=9)
-            
-            # Configurar título y etiquetas
-            if not titulo:
-                titulo = f"Desglose de Costos - Puerto {puerto}"
-                
-            fig.suptitle(titulo, fontsize=14)
-            ax1.set_title("Proporción de Costos", fontsize=11)
-            ax2.set_title("Montos por Categoría", fontsize=11)
-            ax2.set_xlabel("Costo (USD)", fontsize=10)
-            
-            # Añadir texto con información adicional
-            info_texto = f"""
-Puerto: {puerto}
-Distancia: {resultado_puerto['distancia_terrestre']:.0f} km
-Carga: {resultado_puerto['toneladas']:.1f} toneladas
-Costo Total: ${resultado_puerto['costo_total']:,.2f}
-Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
-            """
-            
-            # Posicionar el texto de información
-            plt.figtext(0.01, 0.02, info_texto, fontsize=9, 
-                      bbox=dict(facecolor='lightgray', alpha=0.5))
-            
-            # Eliminar bordes de los gráficos
-            ax2.spines['top'].set_visible(False)
-            ax2.spines['right'].set_visible(False)
-            
-            # Guardar gráfico en memoria como imagen base64
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-            imagen_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-            plt.close(fig)
-            
+
             return {
                 "status": "success",
-                "imagen": imagen_base64,
-                "formato": "png",
+                ("imagen_bytes" if binary else "imagen"): imagen_base64,
+                "formato": formato,
                 "puerto": puerto,
-                "costo_total": resultado_puerto['costo_total'],
-                "costo_unitario": resultado_puerto['costo_unitario']
+                "costo_total": costo_total,
+                "costo_unitario": costo_unitario
             }
-            
+
         except Exception as e:
             logger.error(f"Error al generar gráfico de desglose: {str(e)}")
             return {
@@ -303,29 +670,20 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
             Diccionario con HTML del mapa y metadatos.
         """
         try:
+            _importar_folium()
+
             # Invertir coordenadas para folium (latitud, longitud)
             origen_invertido = (origen[1], origen[0])
             timbues_invertido = (self.coords_timbues[1], self.coords_timbues[0])
             lima_invertido = (self.coords_lima[1], self.coords_lima[0])
             
-            # Crear mapa base
-            mapa = folium.Map(
-                location=[-20, -65],  # Centrado aproximado en Sudamérica
-                zoom_start=4,
-                tiles='CartoDB positron'
-            )
-            
-            # Añadir título al mapa
-            titulo_html = '''
-            <div style="position: fixed; 
-                        top: 10px; left: 50px; width: 300px; height: 90px; 
-                        background-color: white; border-radius: 5px;
-                        z-index: 900; font-size: 14px; padding: 10px">
-                <h4 style="margin-top: 0;">Rutas de Exportación</h4>
-                <p>Comparación de rutas desde el origen hacia puertos alternativos</p>
-            </div>
-            '''
-            mapa.get_root().html.add_child(folium.Element(titulo_html))
+            # Copia del mapa base precomputado (tiles y título ya armados)
+            mapa = _get_base_map()
+
+            # Agrupar marcadores y rutas en un FeatureGroup: cada add_to
+            # sobre el mapa muta el árbol Jinja de folium; armando el
+            # grupo aparte se lo engancha al mapa en una sola pasada
+            fg = folium.FeatureGroup(name="routes")
             
             # Marcador para el origen
             folium.Marker(
@@ -333,7 +691,7 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
                 popup=folium.Popup(f"<b>Origen:</b> {nombre_origen}", max_width=200),
                 tooltip=nombre_origen,
                 icon=folium.Icon(color="green", icon="play", prefix="fa")
-            ).add_to(mapa)
+            ).add_to(fg)
             
             # Marcadores para los puertos
             folium.Marker(
@@ -341,19 +699,19 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
                 popup=folium.Popup("<b>Puerto:</b> Timbúes", max_width=200),
                 tooltip="Puerto Timbúes",
                 icon=folium.Icon(color="blue", icon="anchor", prefix="fa")
-            ).add_to(mapa)
+            ).add_to(fg)
             
             folium.Marker(
                 location=lima_invertido,
                 popup=folium.Popup("<b>Puerto:</b> Lima", max_width=200),
                 tooltip="Puerto Lima",
                 icon=folium.Icon(color="red", icon="anchor", prefix="fa")
-            ).add_to(mapa)
+            ).add_to(fg)
             
             # Añadir líneas de rutas si están disponibles
             if ruta_timbues and ruta_timbues["status"] == "success" and ruta_timbues["geometry"]:
-                # Convertir geometría de polyline a coordenadas [lat, lng]
-                ruta_coords = ruta_timbues["geometry"]
+                # Geometría simplificada y cuantizada en coordenadas [lat, lng]
+                ruta_coords = _simplificar_ruta(ruta_timbues["geometry"])
                 
                 # Dibujar ruta a Timbúes
                 folium.PolyLine(
@@ -362,7 +720,7 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
                     weight=4,
                     opacity=0.8,
                     tooltip=f"Ruta a Timbúes: {ruta_timbues['distance']} km"
-                ).add_to(mapa)
+                ).add_to(fg)
                 
                 # Añadir etiqueta de distancia
                 midpoint = ruta_coords[len(ruta_coords)//2]
@@ -373,11 +731,11 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
                         icon_anchor=(75, 18),
                         html=f'<div style="background-color: rgba(255, 255, 255, 0.8); padding: 2px 5px; border-radius: 3px; font-size: 11px;"><b>Timbúes:</b> {ruta_timbues["distance"]} km</div>'
                     )
-                ).add_to(mapa)
+                ).add_to(fg)
             
             if ruta_lima and ruta_lima["status"] == "success" and ruta_lima["geometry"]:
-                # Convertir geometría de polyline a coordenadas [lat, lng]
-                ruta_coords = ruta_lima["geometry"]
+                # Geometría simplificada y cuantizada en coordenadas [lat, lng]
+                ruta_coords = _simplificar_ruta(ruta_lima["geometry"])
                 
                 # Dibujar ruta a Lima
                 folium.PolyLine(
@@ -386,7 +744,7 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
                     weight=4,
                     opacity=0.8,
                     tooltip=f"Ruta a Lima: {ruta_lima['distance']} km"
-                ).add_to(mapa)
+                ).add_to(fg)
                 
                 # Añadir etiqueta de distancia
                 midpoint = ruta_coords[len(ruta_coords)//2]
@@ -397,13 +755,17 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
                         icon_anchor=(75, 18),
                         html=f'<div style="background-color: rgba(255, 255, 255, 0.8); padding: 2px 5px; border-radius: 3px; font-size: 11px;"><b>Lima:</b> {ruta_lima["distance"]} km</div>'
                     )
-                ).add_to(mapa)
+                ).add_to(fg)
             
+            # Enganchar el grupo completo al mapa de una sola vez
+            fg.add_to(mapa)
+
             # Añadir leyenda con resultados de comparación si están disponibles
             if resultados_comparacion and resultados_comparacion["status"] == "success":
-                puerto_optimo = resultados_comparacion["comparacion"]["puerto_optimo"].title()
-                ahorro = resultados_comparacion["comparacion"]["diferencia_absoluta"]
-                porcentaje = resultados_comparacion["comparacion"]["diferencia_porcentual"]
+                comparacion = resultados_comparacion["comparacion"]
+                puerto_optimo = comparacion["puerto_optimo"].title()
+                ahorro = comparacion["diferencia_absoluta"]
+                porcentaje = comparacion["diferencia_porcentual"]
                 
                 costo_timbues = resultados_comparacion["timbues"]["costo_total"]
                 costo_lima = resultados_comparacion["lima"]["costo_total"]
@@ -414,10 +776,10 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
                             background-color: white; border-radius: 5px;
                             z-index: 900; font-size: 12px; padding: 10px">
                     <h5 style="margin-top: 0;">Comparación de Costos</h5>
-                    <p><b>Timbúes:</b> ${costo_timbues:,.2f}</p>
-                    <p><b>Lima:</b> ${costo_lima:,.2f}</p>
+                    <p><b>Timbúes:</b> {_FMT_USD(costo_timbues)}</p>
+                    <p><b>Lima:</b> {_FMT_USD(costo_lima)}</p>
                     <p><b>Puerto óptimo:</b> {puerto_optimo}</p>
-                    <p><b>Ahorro:</b> ${ahorro:,.2f} ({porcentaje:.1f}%)</p>
+                    <p><b>Ahorro:</b> {_FMT_USD(ahorro)} ({porcentaje:.1f}%)</p>
                 </div>
                 '''
                 mapa.get_root().html.add_child(folium.Element(legend_html))
@@ -425,8 +787,11 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
             # Centrar mapa para incluir todos los puntos
             mapa.fit_bounds([origen_invertido, timbues_invertido, lima_invertido])
             
-            # Convertir mapa a HTML
-            html_mapa = mapa._repr_html_()
+            # Convertir mapa a HTML: render() devuelve el documento
+            # directo, mientras que _repr_html_() (pensado para Jupyter)
+            # lo envuelve en un iframe con srcdoc base64 — un pase extra
+            # sobre un string que puede medir varios MB
+            html_mapa = mapa.get_root().render()
             
             return {
                 "status": "success",
@@ -449,7 +814,10 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
                                    costos_timbues: List[float],
                                    costos_lima: List[float],
                                    nombre_parametro: str,
-                                   unidad_parametro: str) -> Dict:
+                                   unidad_parametro: str,
+                                   formato: str = "png",
+                                   dpi: int = 100,
+                                   binary: bool = False) -> Dict:
         """Generar gráfico de análisis de sensibilidad.
         
         Args:
@@ -458,9 +826,13 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
             costos_lima: Lista de costos correspondientes para Lima.
             nombre_parametro: Nombre del parámetro (ej. 'Distancia', 'Toneladas').
             unidad_parametro: Unidad del parámetro (ej. 'km', 'ton').
+            formato: Formato de salida ('png' en base64 o 'svg' como texto).
+            dpi: Resolución del PNG (ej. 72 para vistas previas).
+            binary: Si es True, devuelve los bytes crudos de la imagen
+                bajo la clave 'imagen_bytes' en lugar de base64.
             
         Returns:
-            Diccionario con imagen base64 del gráfico y metadatos.
+            Diccionario con imagen del gráfico y metadatos.
         """
         try:
             if len(valores_parametro) != len(costos_timbues) or len(valores_parametro) != len(costos_lima):
@@ -469,118 +841,114 @@ Costo Unitario: ${resultado_puerto['costo_unitario']:,.2f}/ton
                     "message": "Las listas de valores y costos deben tener la misma longitud",
                     "imagen": None
                 }
-            
-            # Crear figura
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            # Trazar líneas para cada puerto
-            ax.plot(valores_parametro, costos_timbues, 'o-', 
-                  color=self.colores_primarios[0], 
-                  linewidth=2, 
-                  markersize=6,
-                  label="Puerto Timbúes")
-            
-            ax.plot(valores_parametro, costos_lima, 's-', 
-                  color=self.colores_primarios[1], 
-                  linewidth=2, 
-                  markersize=6,
-                  label="Puerto Lima")
-            
-            # Calcular punto de cruce (si existe)
-            punto_cruce_x = None
-            punto_cruce_y = None
-            
-            for i in range(len(valores_parametro) - 1):
-                if (costos_timbues[i] > costos_lima[i] and costos_timbues[i+1] < costos_lima[i+1]) or \
-                   (costos_timbues[i] < costos_lima[i] and costos_timbues[i+1] > costos_lima[i+1]):
-                    # Estimación lineal del punto de cruce
-                    x1, y1_t, y1_l = valores_parametro[i], costos_timbues[i], costos_lima[i]
-                    x2, y2_t, y2_l = valores_parametro[i+1], costos_timbues[i+1], costos_lima[i+1]
-                    
-                    m_t = (y2_t - y1_t) / (x2 - x1)
-                    m_l = (y2_l - y1_l) / (x2 - x1)
-                    
-                    b_t = y1_t - m_t * x1
-                    b_l = y1_l - m_l * x1
-                    
-                    # Resolver para x: m_t * x + b_t = m_l * x + b_l
-                    punto_cruce_x = (b_l - b_t) / (m_t - m_l)
-                    punto_cruce_y = m_t * punto_cruce_x + b_t
-                    
-                    # Marcar el punto de cruce
-                    ax.plot(punto_cruce_x, punto_cruce_y, 'X', 
-                          color='green', markersize=10, 
-                          label=f"Punto de equilibrio: {punto_cruce_x:.1f} {unidad_parametro}")
-                    
-                    # Línea vertical en el punto de cruce
-                    ax.axvline(x=punto_cruce_x, color='green', linestyle='--', alpha=0.5)
-                    break
-            
-            # Regiones de colores para indicar puerto más conveniente
-            if punto_cruce_x:
-                min_x = min(valores_parametro)
-                max_x = max(valores_parametro)
-                max_y = max(max(costos_timbues), max(costos_lima)) * 1.1
-                
-                # Determinar qué puerto es mejor en cada región
-                if costos_timbues[0] < costos_lima[0]:
-                    # Timbúes es mejor para valores bajos del parámetro
-                    ax.fill_between([min_x, punto_cruce_x], 0, max_y, 
-                                  color=self.colores_primarios[0], alpha=0.1)
-                    ax.fill_between([punto_cruce_x, max_x], 0, max_y, 
-                                  color=self.colores_primarios[1], alpha=0.1)
-                else:
-                    # Lima es mejor para valores bajos del parámetro
-                    ax.fill_between([min_x, punto_cruce_x], 0, max_y, 
-                                  color=self.colores_primarios[1], alpha=0.1)
-                    ax.fill_between([punto_cruce_x, max_x], 0, max_y, 
-                                  color=self.colores_primarios[0], alpha=0.1)
-            
-            # Configurar etiquetas y título
-            ax.set_title(f'Análisis de Sensibilidad - {nombre_parametro}', fontsize=14)
-            ax.set_xlabel(f'{nombre_parametro} ({unidad_parametro})', fontsize=12)
-            ax.set_ylabel('Costo Total (USD)', fontsize=12)
-            
-            # Mejorar estética
-            ax.grid(True, linestyle='--', alpha=0.7)
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            
-            # Colocar leyenda
-            ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=3, fontsize=10)
-            
-            # Añadir anotación de punto de cruce
-            if punto_cruce_x:
-                ax.annotate(
-                    f'Punto de equilibrio:\n{punto_cruce_x:.1f} {unidad_parametro}, ${punto_cruce_y:.2f}',
-                    xy=(punto_cruce_x, punto_cruce_y),
-                    xytext=(punto_cruce_x + (max_x - min_x)*0.1, punto_cruce_y + (max_y*0.1)),
-                    arrowprops=dict(arrowstyle="->", color="black", lw=1.5),
-                    fontsize=9,
-                    bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="gray", alpha=0.8)
-                )
-            
-            # Guardar gráfico en memoria como imagen base64
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-            imagen_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-            plt.close(fig)
-            
+
+            # Tuplas como clave de caché: barridos idénticos (mismos
+            # valores y parámetro) devuelven la imagen ya renderizada
+            imagen_base64, punto_cruce_x, punto_cruce_y = self._render(
+                _render_sensibilidad_png,
+                tuple(valores_parametro),
+                tuple(costos_timbues),
+                tuple(costos_lima),
+                nombre_parametro,
+                unidad_parametro,
+                self._primary2,
+                formato,
+                dpi,
+                binary
+            )
+
             return {
                 "status": "success",
-                "imagen": imagen_base64,
-                "formato": "png",
+                ("imagen_bytes" if binary else "imagen"): imagen_base64,
+                "formato": formato,
                 "parametro": nombre_parametro,
                 "unidad": unidad_parametro,
                 "punto_equilibrio": punto_cruce_x,
                 "costo_equilibrio": punto_cruce_y
             }
-            
+
         except Exception as e:
             logger.error(f"Error al generar gráfico de sensibilidad: {str(e)}")
             return {
                 "status": "error",
                 "message": f"Error al generar gráfico de sensibilidad: {str(e)}",
                 "imagen": None
+            }
+
+    def batch_generar_sensibilidad(self,
+                                 sweeps: List[Dict],
+                                 formato: str = "png",
+                                 dpi: int = 100) -> Dict:
+        """Generar varios gráficos de sensibilidad reutilizando la figura.
+
+        Variante liviana para tableros multi-parámetro: el esqueleto de
+        figura, ejes y líneas se arma una sola vez y cada barrido solo
+        actualiza los datos con set_data, el título y las etiquetas antes
+        de serializar, ahorrando N-1 construcciones de figura. A
+        diferencia de generar_grafico_sensibilidad no dibuja el punto de
+        equilibrio ni las regiones sombreadas.
+
+        Args:
+            sweeps: Lista de diccionarios, cada uno con las claves
+                valores_parametro, costos_timbues, costos_lima,
+                nombre_parametro y unidad_parametro (los mismos campos
+                que recibe generar_grafico_sensibilidad).
+            formato: Formato de salida ('png' en base64 o 'svg' como texto).
+            dpi: Resolución del PNG.
+
+        Returns:
+            Diccionario con la lista de gráficos generados y metadatos.
+        """
+        try:
+            fig = _get_fig((10, 6))
+            ax = fig.add_subplot(111)
+
+            # Líneas vacías que cada barrido rellena con set_data
+            line_t, = ax.plot([], [], 'o-', color=self._primary2[0],
+                              linewidth=2, markersize=6,
+                              label="Puerto Timbúes")
+            line_l, = ax.plot([], [], 's-', color=self._primary2[1],
+                              linewidth=2, markersize=6,
+                              label="Puerto Lima")
+
+            ax.set_ylabel('Costo Total (USD)', fontsize=12)
+            ax.grid(True, linestyle='--', alpha=0.7)
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+            ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15),
+                      ncol=2, fontsize=10)
+
+            resultados = []
+            for sweep in sweeps:
+                nombre = sweep["nombre_parametro"]
+                unidad = sweep["unidad_parametro"]
+
+                line_t.set_data(sweep["valores_parametro"],
+                                sweep["costos_timbues"])
+                line_l.set_data(sweep["valores_parametro"],
+                                sweep["costos_lima"])
+                ax.relim()
+                ax.autoscale_view()
+                ax.set_title(f'Análisis de Sensibilidad - {nombre}',
+                             fontsize=14)
+                ax.set_xlabel(f'{nombre} ({unidad})', fontsize=12)
+
+                resultados.append({
+                    "imagen": _exportar_figura(fig, formato, dpi),
+                    "formato": formato,
+                    "parametro": nombre,
+                    "unidad": unidad
+                })
+
+            return {
+                "status": "success",
+                "resultados": resultados
+            }
+
+        except Exception as e:
+            logger.error(f"Error al generar gráficos de sensibilidad en lote: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Error al generar gráficos de sensibilidad en lote: {str(e)}",
+                "resultados": None
             }
\ No newline at end of file